@@ -8,9 +8,9 @@
 
 
 import os
-import json
 
 from util.base import COMMON_SONAR_LANGS, Sonar as SonarQubeUtil
+from util.writer import ResultWriter
 
 
 class SonarQube(object):
@@ -29,8 +29,8 @@ class SonarQube(object):
             build_cwd=build_cwd,
         )
 
-        with open("result.json", "w") as fp:
-            json.dump(issues, fp, indent=2)
+        with ResultWriter("result.json") as writer:
+            writer.write_all(issues)
 
 
 tool = SonarQube
@@ -11,9 +11,9 @@ SonarQube for C#
 """
 
 import os
-import json
 
 from util.base import Sonar as SonarQubeUtil
+from util.writer import ResultWriter
 
 
 class SonarQubeCs(object):
@@ -26,13 +26,15 @@ class SonarQubeCs(object):
         build_cwd = os.environ.get("BUILD_CWD", None)
         build_cwd = os.path.join(sonar_scanner.source_dir, build_cwd) if build_cwd else sonar_scanner.source_dir
 
-        sonar_scanner.pre_cmd(build_cwd)
+        # 服务启动的同时执行前置命令
+        with sonar_scanner.boot_server_in_background("cs"):
+            sonar_scanner.pre_cmd(build_cwd)
         issues = sonar_scanner.scan_proj(
             sonar_scanner.scan_cs_vb_proj, languages="cs", build_cmd=build_cmd, build_cwd=build_cwd
         )
 
-        with open("result.json", "w") as fp:
-            json.dump(issues, fp, indent=2)
+        with ResultWriter("result.json") as writer:
+            writer.write_all(issues)
 
 
 tool = SonarQubeCs
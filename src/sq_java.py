@@ -11,9 +11,9 @@ SonarQube for Java
 """
 
 import os
-import json
 
 from util.base import Sonar as SonarQubeUtil
+from util.writer import ResultWriter
 
 
 class SonarQubeJava(object):
@@ -21,15 +21,18 @@ class SonarQubeJava(object):
         """
         :return:
         """
-        print("当前执行模式BUILD_TYPE: %s" % build_type)
         sonar_scanner = SonarQubeUtil()
         envs = os.environ
         build_cmd = sonar_scanner.params.get("build_cmd", None)
         build_cwd = envs.get("BUILD_CWD", None)
         build_cwd = os.path.join(sonar_scanner.source_dir, build_cwd) if build_cwd else sonar_scanner.source_dir
         build_type = envs.get("SONAR_BUILD_TYPE", "no_build").lower()
-        
-        sonar_scanner.pre_cmd(build_cwd)
+        print("当前执行模式BUILD_TYPE: %s" % build_type)
+
+        # 服务启动的同时执行前置命令和编译
+        with sonar_scanner.boot_server_in_background("java"):
+            sonar_scanner.pre_cmd(build_cwd)
+            sonar_scanner.pre_build(build_type, build_cwd, build_cmd)
         issues = sonar_scanner.scan_proj(
             sonar_scanner.scan_java_proj,
             languages="java",
@@ -38,8 +41,8 @@ class SonarQubeJava(object):
             build_cmd=build_cmd,
         )
 
-        with open("result.json", "w") as fp:
-            json.dump(issues, fp, indent=2)
+        with ResultWriter("result.json") as writer:
+            writer.write_all(issues)
 
 
 tool = SonarQubeJava
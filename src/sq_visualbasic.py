@@ -11,9 +11,9 @@ SonarQube for Visual Basic
 """
 
 import os
-import json
 
 from util.base import Sonar as SonarQubeUtil
+from util.writer import ResultWriter
 
 
 class SonarQubeVB(object):
@@ -26,13 +26,15 @@ class SonarQubeVB(object):
         build_cwd = os.environ.get("BUILD_CWD", None)
         build_cwd = os.path.join(sonar_scanner.source_dir, build_cwd) if build_cwd else sonar_scanner.source_dir
 
-        sonar_scanner.pre_cmd(build_cwd)
+        # 服务启动的同时执行前置命令
+        with sonar_scanner.boot_server_in_background("vbnet"):
+            sonar_scanner.pre_cmd(build_cwd)
         issues = sonar_scanner.scan_proj(
             sonar_scanner.scan_cs_vb_proj, languages="vbnet", build_cmd=build_cmd, build_cwd=build_cwd
         )
 
-        with open("result.json", "w") as fp:
-            json.dump(issues, fp, indent=2)
+        with ResultWriter("result.json") as writer:
+            writer.write_all(issues)
 
 
 tool = SonarQubeVB
@@ -0,0 +1,353 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# Copyright (c) 2025 THL A29 Limited
+#
+# This source code file is made available under LGPL License
+# See LICENSE for details
+# ==============================================================================
+
+"""
+文件分析结果缓存
+按(文件路径, 文件内容哈希)缓存每个文件的问题，缓存按(任务规则及参数, 分析器版本, 分析参数)的哈希分区。
+全量分析时只把新增或者有变化的文件通过sonar.inclusions交给scanner，其余文件直接使用缓存的问题。
+缓存总大小超过上限时按最近使用时间淘汰，总大小按写入量估算，估算超过上限时才遍历缓存目录。
+"""
+
+import os
+import re
+import sys
+import json
+import mmap
+import shutil
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+from typing import Dict, Iterable, List, Pattern
+
+import settings
+
+# 分析结果缓存开关，默认关闭
+ANALYSIS_CACHE_ENV = "SQ_ANALYSIS_CACHE"
+# 缓存大小上限，单位MB
+ANALYSIS_CACHE_SIZE_ENV = "SQ_ANALYSIS_CACHE_SIZE"
+ANALYSIS_CACHE_SIZE = 1024
+# 淘汰后保留上限的比例，避免每次任务都触发淘汰
+ANALYSIS_CACHE_LOW_WATER = 0.8
+# 并发计算文件哈希的线程数，hashlib计算时会释放GIL
+HASH_WORKERS = 8
+# 变化的文件超过该比例时直接全量分析
+MAX_CHANGED_RATIO = 0.5
+# 单个命令行参数的长度限制
+MAX_INCLUSIONS_LENGTH = 24000 if sys.platform == "win32" else 100000
+# 所有文件都命中缓存时，传给scanner的不匹配任何文件的包含路径
+NO_FILE_INCLUSION = "**/.sq_analysis_cache_no_file"
+# 缓存总大小估算值的记录文件
+SIZE_ESTIMATE_NAME = "size_estimate.json"
+# 分析过程中暂存问题的目录，不计入缓存大小
+STAGING_DIR_NAME = ".staging"
+# 不参与分析的目录
+SKIP_DIRS = (".git", ".svn", ".hg", ".scannerwork", ".sonarqube")
+# 各语言分析的文件名，与SonarQube各语言插件默认的sonar.<lang>.file.suffixes一致
+# text和secrets分析所有文本文件，不在映射中，任务包含这类语言时不按文件名过滤
+LANGUAGE_FILE_PATTERNS = {
+    "azureresourcemanager": ("*.bicep",),
+    "cloudformation": ("*.json", "*.yaml", "*.yml"),
+    "cs": ("*.cs", "*.razor"),
+    "css": ("*.css", "*.less", "*.scss", "*.sass"),
+    "docker": ("dockerfile", "dockerfile.*", "*.dockerfile"),
+    "flex": ("*.as",),
+    "go": ("*.go",),
+    "java": ("*.java", "*.jav", "*.jsp", "*.jspf", "*.jspx"),
+    "js": ("*.js", "*.jsx", "*.cjs", "*.mjs", "*.vue"),
+    "kotlin": ("*.kt", "*.kts"),
+    "kubernetes": ("*.yaml", "*.yml"),
+    "php": ("*.php", "*.php3", "*.php4", "*.php5", "*.phtml", "*.inc"),
+    "py": ("*.py", "*.ipynb"),
+    "ruby": ("*.rb",),
+    "scala": ("*.scala",),
+    "terraform": ("*.tf",),
+    "ts": ("*.ts", "*.tsx", "*.cts", "*.mts"),
+    "vbnet": ("*.vb",),
+    "web": (
+        "*.html",
+        "*.xhtml",
+        "*.cshtml",
+        "*.vbhtml",
+        "*.aspx",
+        "*.ascx",
+        "*.rhtml",
+        "*.erb",
+        "*.shtm",
+        "*.shtml",
+        "*.cmp",
+        "*.twig",
+        "*.jsp",
+        "*.jspf",
+        "*.jspx",
+    ),
+    "xml": ("*.xml", "*.xsd", "*.xsl", "*.config"),
+}
+
+
+def is_analysis_cache_enabled() -> bool:
+    return os.environ.get(ANALYSIS_CACHE_ENV, "false").lower() in ("1", "true", "yes", "on")
+
+
+def get_cache_size() -> int:
+    return int(os.environ.get(ANALYSIS_CACHE_SIZE_ENV, ANALYSIS_CACHE_SIZE)) * 1024 * 1024
+
+
+def get_analyzer_version() -> str:
+    """
+    分析器版本: SonarQube和scanner版本，以及服务端加载的插件包
+    """
+    jars = list()
+    for sub_dir in (os.path.join("lib", "extensions"), os.path.join("extensions", "plugins")):
+        plugin_dir = os.path.join(settings.SONARQUBE_HOME, sub_dir)
+        if os.path.isdir(plugin_dir):
+            jars.extend(name for name in os.listdir(plugin_dir) if name.endswith(".jar"))
+    content = json.dumps(
+        [os.path.basename(settings.SONARQUBE_HOME), os.path.basename(settings.SONAR_SCANNER_HOME), sorted(jars)]
+    )
+    return hashlib.sha1(content.encode()).hexdigest()
+
+
+def hash_content(path: str) -> str:
+    sha = hashlib.sha1()
+    with open(path, "rb") as f:
+        # 空文件不能mmap
+        if os.fstat(f.fileno()).st_size == 0:
+            return sha.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            sha.update(mm)
+    return sha.hexdigest()
+
+
+def list_files(root_dir: str) -> List[str]:
+    paths = list()
+    for dirpath, dirnames, filenames in os.walk(root_dir):
+        dirnames[:] = [name for name in dirnames if name not in SKIP_DIRS]
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if os.path.isfile(path):
+                paths.append(path)
+    return paths
+
+
+def get_language_patterns(languages: str) -> List[str]:
+    """
+    任务语言分析的文件名模式，包含未知语言或者分析所有文件的语言时返回None，不按文件名过滤
+    """
+    langs = [lang.strip().lower() for lang in languages.split(",") if lang.strip()] if languages else []
+    if not langs or any(lang not in LANGUAGE_FILE_PATTERNS for lang in langs):
+        return None
+    patterns = set()
+    for lang in langs:
+        patterns.update(LANGUAGE_FILE_PATTERNS[lang])
+    return sorted(patterns)
+
+
+def compile_sonar_patterns(patterns: Iterable[str]) -> Pattern:
+    """
+    把SonarQube的路径匹配模式(**、*、?)转换为正则，没有模式时返回None
+    """
+    regexes = list()
+    for pattern in patterns:
+        pattern = pattern.strip().strip('"').replace("\\", "/")
+        if not pattern:
+            continue
+        tokens = re.split(r"(\*\*/|\*\*|\*|\?)", pattern)
+        converted = {"**/": "(?:.*/)?", "**": ".*", "*": "[^/]*", "?": "[^/]"}
+        regexes.append("".join(converted.get(token, re.escape(token)) for token in tokens))
+    if not regexes:
+        return None
+    return re.compile("^(?:%s)$" % "|".join(regexes))
+
+
+def select_files(
+    paths: List[str], base_dir: str, sources: str, languages: str, exclusions: Iterable[str]
+) -> List[str]:
+    """
+    只保留scanner会分析的文件: 位于sonar.sources下、文件名属于任务语言、不被sonar.exclusions排除
+    :param paths: 文件绝对路径
+    :param base_dir: scanner的项目根目录，路径模式相对于该目录
+    :param sources: sonar.sources，逗号分隔
+    :param languages: 任务语言，逗号分隔
+    :param exclusions: sonar.exclusions中的模式
+    :return:
+    """
+    source_roots = [os.path.normpath(os.path.join(base_dir, src.strip())) for src in sources.split(",") if src.strip()]
+    name_patterns = get_language_patterns(languages)
+    exclusion_regex = compile_sonar_patterns(exclusions)
+    selected = list()
+    for path in paths:
+        norm_path = os.path.normpath(path)
+        if source_roots and not any(norm_path == root or norm_path.startswith(root + os.sep) for root in source_roots):
+            continue
+        if name_patterns is not None:
+            name = os.path.basename(path).lower()
+            if not any(fnmatch(name, pattern) for pattern in name_patterns):
+                continue
+        rel_path = os.path.relpath(norm_path, os.path.normpath(base_dir)).replace(os.sep, "/")
+        if exclusion_regex is not None and exclusion_regex.match(rel_path):
+            continue
+        selected.append(path)
+    return selected
+
+
+def hash_files(paths: List[str], max_workers: int = HASH_WORKERS) -> Dict[str, str]:
+    """
+    并发计算文件内容哈希，读取失败的文件不返回
+    """
+
+    def _hash(path):
+        try:
+            return hash_content(path)
+        except (OSError, ValueError):
+            return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        hashes = executor.map(_hash, paths, chunksize=64)
+        return {path: value for path, value in zip(paths, hashes) if value is not None}
+
+
+class AnalysisCache(object):
+    def __init__(
+        self, namespace: str, cache_dir: str = os.path.join(settings.TOOL_DIR, "analysis_cache"), max_size: int = None
+    ) -> None:
+        """
+        :param namespace: 规则集、分析器版本和分析参数的哈希
+        :param cache_dir: 缓存目录
+        :param max_size: 缓存大小上限，单位字节
+        """
+        self.cache_dir = cache_dir
+        self.namespace_dir = os.path.join(cache_dir, namespace)
+        self.max_size = max_size if max_size is not None else get_cache_size()
+        self.estimate_path = os.path.join(cache_dir, SIZE_ESTIMATE_NAME)
+        # 本次任务写入的字节数
+        self._written = 0
+        # 本次任务暂存问题的目录，分析结束后写入缓存
+        self._staging_dir: str = None
+        if not os.path.exists(self.namespace_dir):
+            os.makedirs(self.namespace_dir)
+
+    def _entry_path(self, rel_path: str, content_hash: str) -> str:
+        key = hashlib.sha1(("%s:%s" % (rel_path, content_hash)).encode()).hexdigest()
+        return os.path.join(self.namespace_dir, key[:2], "%s.json" % key)
+
+    def get(self, rel_path: str, content_hash: str) -> List[dict]:
+        """
+        获取文件缓存的问题，没有缓存时返回None
+        """
+        entry_path = self._entry_path(rel_path, content_hash)
+        try:
+            with open(entry_path, "r") as f:
+                issues = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # 更新使用时间，用于淘汰
+        try:
+            os.utime(entry_path, None)
+        except OSError:
+            pass
+        return issues
+
+    def put(self, rel_path: str, content_hash: str, issues: Iterable[dict]) -> None:
+        entry_path = self._entry_path(rel_path, content_hash)
+        entry_dir = os.path.dirname(entry_path)
+        if not os.path.exists(entry_dir):
+            os.makedirs(entry_dir, exist_ok=True)
+        # 并发任务可能同时写入，先写临时文件再替换
+        temp_path = "%s.%d.temp" % (entry_path, os.getpid())
+        with open(temp_path, "w") as f:
+            json.dump(list(issues), f, separators=(",", ":"))
+            self._written += f.tell()
+        os.replace(temp_path, entry_path)
+
+    def _staging_path(self, rel_path: str) -> str:
+        if self._staging_dir is None:
+            staging_root = os.path.join(self.cache_dir, STAGING_DIR_NAME)
+            os.makedirs(staging_root, exist_ok=True)
+            self._staging_dir = tempfile.mkdtemp(dir=staging_root)
+        return os.path.join(self._staging_dir, hashlib.sha1(rel_path.encode()).hexdigest())
+
+    def stage(self, rel_path: str, issue: dict) -> None:
+        """
+        暂存文件的一个问题，问题以流的方式返回，不在内存中按文件汇总
+        """
+        with open(self._staging_path(rel_path), "a") as f:
+            f.write(json.dumps(issue, separators=(",", ":")))
+            f.write("\n")
+
+    def commit(self, rel_path: str, content_hash: str) -> None:
+        """
+        把文件暂存的问题写入缓存，没有暂存的问题时缓存空结果
+        """
+        staging_path = self._staging_path(rel_path)
+        issues = list()
+        if os.path.exists(staging_path):
+            with open(staging_path, "r") as f:
+                issues = [json.loads(line) for line in f if line.strip()]
+            os.remove(staging_path)
+        self.put(rel_path, content_hash, issues)
+
+    def discard_staging(self) -> None:
+        if self._staging_dir is not None:
+            shutil.rmtree(self._staging_dir, ignore_errors=True)
+            self._staging_dir = None
+
+    def _read_estimate(self) -> int:
+        try:
+            with open(self.estimate_path, "r") as f:
+                return int(json.load(f)["size"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return 0
+
+    def _write_estimate(self, size: int) -> None:
+        temp_path = "%s.%d.temp" % (self.estimate_path, os.getpid())
+        with open(temp_path, "w") as f:
+            json.dump({"size": size}, f)
+        os.replace(temp_path, self.estimate_path)
+
+    def prune(self) -> None:
+        """
+        缓存总大小超过上限时，按最近使用时间淘汰到上限的ANALYSIS_CACHE_LOW_WATER
+        覆盖写入的条目也计入估算值，估算值只会偏大，遍历后按实际大小更新
+        """
+        estimate = self._read_estimate() + self._written
+        self._written = 0
+        if estimate <= self.max_size:
+            self._write_estimate(estimate)
+            return
+        entries = list()
+        total = 0
+        for dirpath, dirnames, filenames in os.walk(self.cache_dir):
+            dirnames[:] = [name for name in dirnames if name != STAGING_DIR_NAME]
+            for name in filenames:
+                if name == SIZE_ESTIMATE_NAME:
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        if total <= self.max_size:
+            self._write_estimate(total)
+            return
+        target = self.max_size * ANALYSIS_CACHE_LOW_WATER
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # 其他任务已经清理
+                continue
+            total -= size
+            removed += 1
+        self._write_estimate(total)
+        print("[info] 清理分析结果缓存: %d个文件" % removed)
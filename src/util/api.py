@@ -12,14 +12,48 @@ SQ Server API交互模块
 """
 
 import json
+import math
+import random
 import operator
+from collections import deque
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
 import requests
 import logging
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from util.exceptions import ClientError, ServerError, AuthError, ValidationError
 
 logging.getLogger("requests").setLevel(logging.WARNING)
 
+# 连接池大小，需要覆盖并发分页请求的线程数
+POOL_MAXSIZE = 16
+# 分页接口的最大分页大小，以及并发获取分页的线程数
+PAGE_SIZE = 500
+PAGE_WORKERS = 8
+# 问题查询接口最多只能返回前10000个结果，超过时需要拆分查询
+ISSUE_WINDOW = 10000
+# 拆分问题查询时依次尝试的分面
+ISSUE_FACETS = ("types", "severities", "rules", "directories", "files")
+# 并发执行的问题子查询数
+ISSUE_QUERY_WORKERS = 4
+# 单个查询中rules参数的最大长度，避免URL过长
+RULES_PARAM_LENGTH = 2000
+# 幂等请求的重试次数和退避系数
+RETRY_TOTAL = 3
+RETRY_BACKOFF = 0.5
+
+
+class JitterRetry(Retry):
+    """
+    指数退避的基础上加上随机抖动，避免并发请求同时重试
+    """
+
+    def get_backoff_time(self):
+        backoff = super(JitterRetry, self).get_backoff_time()
+        return backoff * random.uniform(0.5, 1.5) if backoff else backoff
+
 
 class SQAPIHandler(object):
     def __init__(self, host="http://localhost", port=9000, base_path="", user=None, password=None, token=None):
@@ -27,6 +61,21 @@ class SQAPIHandler(object):
         self._port = port
         self._base_path = base_path
         self._session = requests.Session()
+        # 连接池和重试策略
+        # - 只重试幂等请求，POST请求由调用方决定是否重试
+        # - 连接失败不重试，服务启动探测需要快速失败
+        retry = JitterRetry(
+            total=RETRY_TOTAL,
+            connect=0,
+            backoff_factor=RETRY_BACKOFF,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(["GET", "HEAD", "OPTIONS"]),
+            raise_on_status=False,
+        )
+        self._adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+        self._session.mount("http://", self._adapter)
+        self._session.mount("https://", self._adapter)
+        self._session.headers.update({"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"})
         # auth信息
         if token:
             self._session.auth = token, ""
@@ -41,7 +90,7 @@ class SQAPIHandler(object):
         url = self._get_url(endpoint)
 
         if use_query_param and data:
-            params = [f'{key}={data[key]}' for key in data]
+            params = [f'{key}={quote(str(data[key]), safe=",:/")}' for key in data]
             url = f"{url}?{'&'.join(params)}"
         # print(f"request: {url}, method: {method}, data: {data}")
         res = call(url, data=data or {}, files=files)
@@ -64,8 +113,94 @@ class SQAPIHandler(object):
             # 5xx is server error
             raise ServerError(res.reason)
 
+    @staticmethod
+    def _get_paging(res):
+        """
+        兼容两种分页格式: {"p", "ps", "total"} 和 {"paging": {"pageIndex", "pageSize", "total"}}
+        :return: (total, page_size)
+        """
+        if "paging" in res:
+            return res["paging"]["total"], res["paging"]["pageSize"]
+        return res["total"], res["ps"]
+
+    def _fetch_page(self, method, endpoint, use_query_param, params, page):
+        page_params = dict(params)
+        page_params["p"] = page
+        return self._request(method, endpoint, use_query_param=use_query_param, **page_params).json()
+
+    @staticmethod
+    def _ordered_map(func, args_list, max_workers):
+        """
+        以有限并发执行func，按提交顺序返回结果
+        :param func:
+        :param args_list: 每次调用的参数元组列表
+        :param max_workers: 最多同时在途的调用数
+        :return:
+        """
+        max_workers = max(min(max_workers, len(args_list)), 1)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = deque()
+            index = 0
+            try:
+                while index < len(args_list) or pending:
+                    while index < len(args_list) and len(pending) < max_workers:
+                        pending.append(executor.submit(func, *args_list[index]))
+                        index += 1
+                    yield pending.popleft().result()
+            finally:
+                # 提前结束时取消还没有开始的调用
+                for future in pending:
+                    future.cancel()
+
+    def _paginate(self, method, endpoint, items_key, use_query_param=False, max_workers=PAGE_WORKERS,
+                  max_total=None, **params):
+        """
+        分页获取: 先获取第一页得到总数，剩余分页以有限并发获取，按顺序返回，调用方可以边获取边处理
+        :param method:
+        :param endpoint:
+        :param items_key: 结果列表在响应中的字段名，或者从响应中取出结果列表的函数
+        :param use_query_param:
+        :param max_workers: 并发获取分页的线程数
+        :param max_total: 最多获取的结果数，用于接口有结果窗口限制的情况
+        :param params:
+        :return:
+        """
+        params.setdefault("ps", PAGE_SIZE)
+        res = self._fetch_page(method, endpoint, use_query_param, params, 1)
+        total, page_size = self._get_paging(res)
+        get_items = items_key if callable(items_key) else operator.itemgetter(items_key)
+        for item in get_items(res):
+            yield item
+
+        if max_total is not None:
+            total = min(total, max_total)
+        n_pages = int(math.ceil(total / float(page_size))) if page_size else 1
+        args_list = [(method, endpoint, use_query_param, params, page) for page in range(2, n_pages + 1)]
+        for res in self._ordered_map(self._fetch_page, args_list, max_workers):
+            for item in get_items(res):
+                yield item
+
+    def get_connection_stats(self):
+        """
+        获取每个host的连接复用情况
+        :return: {host: {"connections": 新建连接数, "requests": 请求数, "reused": 复用连接的请求数}}
+        """
+        stats = dict()
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            if pool is None:
+                continue
+            host = "%s://%s:%s" % (pool.scheme, pool.host, pool.port)
+            stats[host] = {
+                "connections": pool.num_connections,
+                "requests": pool.num_requests,
+                "reused": max(pool.num_requests - pool.num_connections, 0),
+            }
+        return stats
+
     def activate_rule(self, key, profile_key, reset=False, severity=None, **params):
-        data = {"rule_key": key, "profile_key": profile_key, "reset": reset and "true" or "false"}
+        data = {"rule": key, "key": profile_key, "reset": reset and "true" or "false"}
 
         if not reset:
             if severity:
@@ -78,6 +213,26 @@ class SQAPIHandler(object):
         res = self._request("post", "/api/qualityprofiles/activate_rule", **data)
         return res
 
+    def deactivate_rule(self, key, profile_key):
+        data = {"rule": key, "key": profile_key}
+        res = self._request("post", "/api/qualityprofiles/deactivate_rule", **data)
+        return res
+
+    def get_active_rules(self, profile_key):
+        """
+        获取质量配置中激活的规则及其级别和参数
+        :return: 生成器，元素为(规则key, {"severity", "params"})
+        """
+        qs = {"activation": "true", "qprofile": profile_key, "f": "actives"}
+
+        def iter_actives(res):
+            for rule_key, actives in res.get("actives", dict()).items():
+                for active in actives:
+                    if active["qProfile"] == profile_key:
+                        yield rule_key, active
+
+        return self._paginate("get", "/api/rules/search", iter_actives, use_query_param=True, **qs)
+
     def create_rule(self, key, name, description, message, xpath, severity, status, template_key):
         data = {
             "custom_key": key,
@@ -99,23 +254,10 @@ class SQAPIHandler(object):
                 fields = ",".join(fields)
             qs["f"] = fields.lower()
 
-        page_num = 1
-        page_size = 1
-        n_metrics = 2
-
-        while page_num * page_size < n_metrics:
-            res = self._request("get", "/api/metrics/search", use_query_param=True, **qs).json()
-            page_num = res["p"]
-            page_size = res["ps"]
-            n_metrics = res["total"]
-
-            qs["p"] = page_num + 1
-
-            for metric in res["metrics"]:
-                yield metric
+        return self._paginate("get", "/api/metrics/search", "metrics", use_query_param=True, **qs)
 
     def get_rules(self, active_only=False, profile=None, languages=None, custom_only=False, f=None):
-        qs = {"is_template": "no", "statuses": "READY", "ps": 500}
+        qs = {"is_template": "no", "statuses": "READY"}
 
         if profile:
             qs.update({"activation": "true", "qprofile": profile})
@@ -133,22 +275,7 @@ class SQAPIHandler(object):
         if f:
             qs["f"] = f
 
-        page_num = 1
-        page_size = 1
-        n_rules = 2
-        while page_num * page_size < n_rules:
-            res = self._request("get", "/api/rules/search", use_query_param=True, **qs).json()
-            # print(json.dumps(res))
-            page_num = res["p"]
-            page_size = res["ps"]
-            n_rules = res["total"]
-            qs["p"] = page_num + 1
-            # print(f"page_num: {page_num}")
-            # print(f"page_size: {page_size}")
-            # print(f"n_rules: {n_rules}")
-
-            for rule in res["rules"]:
-                yield rule
+        return self._paginate("get", "/api/rules/search", "rules", use_query_param=True, **qs)
 
     def rules_show(self, key, actives=None):
         params = {"key": key}
@@ -259,6 +386,27 @@ class SQAPIHandler(object):
         res = self._request("post", "/api/projects/delete", **params)
         return res
 
+    def webhooks_create(self, name, url, project=None, secret=None):
+        params = {"name": name, "url": url}
+        if project is not None:
+            params["project"] = project
+        if secret is not None:
+            params["secret"] = secret
+        res = self._request("post", "/api/webhooks/create", **params).json()
+        return res
+
+    def webhooks_delete(self, webhook):
+        params = {"webhook": webhook}
+        res = self._request("post", "/api/webhooks/delete", **params)
+        return res
+
+    def webhooks_list(self, project=None):
+        params = dict()
+        if project is not None:
+            params["project"] = project
+        res = self._request("get", "/api/webhooks/list", use_query_param=True, **params).json()
+        return res
+
     def get_project(self, projects=None, onProvisionedOnly=None, analyzedBefore=None, qualifiers=None, q=None):
         params = dict()
 
@@ -273,23 +421,20 @@ class SQAPIHandler(object):
         if q is not None:
             params["q"] = q
 
-        page_num = 1
-        page_size = 1
-        n_projects = 2
-
-        while page_num * page_size < n_projects:
-            res = self._request("post", "/api/projects/search", **params).json()
-            paging = res["paging"]
-            page_num = paging["pageIndex"]
-            page_size = paging["pageSize"]
-            n_projects = paging["total"]
-
-            params["p"] = page_num + 1
-
-            for project in res["components"]:
-                yield project
-
-    def get_issues(self, languages=None, componentKeys=None, rules=None):
+        return self._paginate("post", "/api/projects/search", "components", **params)
+
+    def get_issues(self, languages=None, componentKeys=None, rules=None, resolved=None):
+        """
+        获取问题列表
+        - rules过长时按URL长度拆分成多个查询
+        - 结果数超过ISSUE_WINDOW时按分面拆分成多个子查询
+        子查询并发获取，按问题key去重
+        :param languages:
+        :param componentKeys:
+        :param rules: 规则列表或者逗号分隔的字符串
+        :param resolved: 是否只返回已解决(true)或者未解决(false)的问题
+        :return:
+        """
         params = dict()
 
         if languages:
@@ -298,22 +443,113 @@ class SQAPIHandler(object):
             params["languages"] = languages.lower()
         if componentKeys is not None:
             params["componentKeys"] = componentKeys
-        if rules is not None:
-            params["rules"] = rules
-
-        page_num = 1
-        page_size = 1
-        n_issues = 2
-
-        while page_num * page_size < n_issues:
-            res = self._request("get", "/api/issues/search", use_query_param=True, **params).json()
-            page_num = res["p"]
-            page_size = res["ps"]
-            n_issues = res["total"]
-
-            params["p"] = page_num + 1
+        if resolved is not None:
+            params["resolved"] = resolved
+
+        args_list = list()
+        for rules_chunk in self._split_rules(rules):
+            chunk_params = dict(params)
+            if rules_chunk:
+                chunk_params["rules"] = rules_chunk
+            args_list.append((chunk_params,))
+        queries = list()
+        for chunk_queries in self._ordered_map(self._plan_issue_queries, args_list, ISSUE_QUERY_WORKERS):
+            queries.extend(chunk_queries)
+        if len(queries) > 1:
+            print("[info] 问题查询拆分为%d个子查询" % len(queries))
+        return self._fetch_issue_queries(queries)
+
+    @staticmethod
+    def _split_rules(rules):
+        """
+        将规则列表拆分为多个逗号分隔的字符串，每个字符串长度不超过RULES_PARAM_LENGTH
+        """
+        if not rules:
+            return [None]
+        if isinstance(rules, str):
+            rules = rules.split(",")
+        chunks = list()
+        chunk = list()
+        length = 0
+        for rule in rules:
+            if chunk and length + len(rule) + 1 > RULES_PARAM_LENGTH:
+                chunks.append(",".join(chunk))
+                chunk = list()
+                length = 0
+            chunk.append(rule)
+            length += len(rule) + 1
+        chunks.append(",".join(chunk))
+        return chunks
+
+    def _probe_issues(self, params, facets):
+        """
+        只获取问题总数和分面统计
+        :return: (total, {facet: [{"val", "count"}]})
+        """
+        qs = dict(params)
+        qs.update({"ps": 1, "p": 1})
+        if facets:
+            qs["facets"] = ",".join(facets)
+        res = self._request("get", "/api/issues/search", use_query_param=True, **qs).json()
+        total, _ = self._get_paging(res)
+        return total, {facet["property"]: facet["values"] for facet in res.get("facets", [])}
+
+    def _plan_issue_queries(self, params, facets=ISSUE_FACETS):
+        """
+        拆分问题查询，每个子查询的结果数不超过ISSUE_WINDOW
+        :param params: 查询参数
+        :param facets: 可用于拆分的分面
+        :return: 子查询参数列表
+        """
+        total, facet_values = self._probe_issues(params, facets)
+        if total <= ISSUE_WINDOW:
+            return [params] if total else []
+        for index, facet in enumerate(facets):
+            values = facet_values.get(facet, [])
+            # 分面返回的取值数有上限，取值不全或者有问题不属于任何取值时，不能按该分面拆分
+            if sum(value["count"] for value in values) != total or any("," in value["val"] for value in values):
+                continue
+            queries = list()
+            for value in values:
+                if not value["count"]:
+                    continue
+                sub_params = dict(params)
+                sub_params[facet] = value["val"]
+                if value["count"] <= ISSUE_WINDOW:
+                    queries.append(sub_params)
+                else:
+                    queries.extend(self._plan_issue_queries(sub_params, facets[index + 1:]))
+            return queries
+        print("[warning] 问题数%d超过%d且无法继续拆分查询，只能获取前%d个问题" % (total, ISSUE_WINDOW, ISSUE_WINDOW))
+        return [params]
+
+    def _fetch_issues(self, params):
+        return list(
+            self._paginate(
+                "get",
+                "/api/issues/search",
+                "issues",
+                use_query_param=True,
+                max_workers=max(PAGE_WORKERS // ISSUE_QUERY_WORKERS, 1),
+                max_total=ISSUE_WINDOW,
+                **params
+            )
+        )
 
-            for issue in res["issues"]:
+    def _fetch_issue_queries(self, queries):
+        if len(queries) == 1:
+            # 单个查询直接流式返回
+            for issue in self._paginate(
+                "get", "/api/issues/search", "issues", use_query_param=True, max_total=ISSUE_WINDOW, **queries[0]
+            ):
+                yield issue
+            return
+        keys = set()
+        for issues in self._ordered_map(self._fetch_issues, [(params,) for params in queries], ISSUE_QUERY_WORKERS):
+            for issue in issues:
+                if issue["key"] in keys:
+                    continue
+                keys.add(issue["key"])
                 yield issue
 
     def duplications_show(self, key):
@@ -328,6 +564,11 @@ class SQAPIHandler(object):
         res = self._request("get", "/api/ce/task", use_query_param=True, **params).json()
         return res
 
+    def ce_cancel(self, id_):
+        params = {"id": id_}
+        res = self._request("post", "/api/ce/cancel", **params)
+        return res
+
     def languages_list(self):
         res = self._request("get", "/api/languages/list").json()
         return res
@@ -349,6 +590,13 @@ class SQAPIHandler(object):
         res = self._request("post", "/api/settings/set", **params)
         return res
 
+    def reset_settings(self, keys, component=None):
+        params = {"keys": keys}
+        if component is not None:
+            params["component"] = component
+        res = self._request("post", "/api/settings/reset", **params)
+        return res
+
     def get_settings(self, keys=None, component=None):
         params = dict()
         if keys is not None:
@@ -437,21 +685,7 @@ class SQAPIHandler(object):
         if q is not None:
             params["q"] = q
 
-        page_num = 1
-        page_size = 1
-        n_projects = 2
-
-        while page_num * page_size < n_projects:
-            res = self._request("post", "/api/qualityprofiles/projects", **params).json()
-            paging = res["paging"]
-            page_num = paging["pageIndex"]
-            page_size = paging["pageSize"]
-            n_projects = paging["total"]
-
-            params["p"] = page_num + 1
-
-            for project in res["results"]:
-                yield project
+        return self._paginate("post", "/api/qualityprofiles/projects", "results", **params)
 
 
 if __name__ == "__main__":
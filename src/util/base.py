@@ -10,12 +10,17 @@ import os
 import re
 import sys
 import json
+import hashlib
 import shlex
 import traceback
+import threading
+from contextlib import contextmanager
+from functools import partial
 from shutil import copyfile, rmtree
 from time import sleep, time
 from multiprocessing import cpu_count
-from typing import List
+from collections import deque
+from typing import Dict, Iterator, List
 
 try:
     import xml.etree.cElementTree as ET
@@ -24,7 +29,6 @@ except ImportError:
 
 import settings
 from util.exceptions import CompileTaskError, AnalyzeTaskError, ConfigError, ValidationError, ClientError, ServerError
-from util.configlib import ConfigReader
 from util.common import (
     SONAR_DEVCOST,
     SONAR_DEBT_RATINGGRID,
@@ -39,7 +43,41 @@ from util.common import (
     decode,
 )
 from util.server import SQServer
+from util.resources import ResourcePlan, is_plan_enabled
+from util.cds import CDSArchive, is_cds_enabled
 from util.api import SQAPIHandler
+from util.duplications import DuplicationCache, DUPLICATION_LOOKAHEAD
+from util.issues import IssueRecord, IssueTables
+from util.rules import RuleCatalog
+from util.taskgraph import TaskGraph
+from util.webhook import VALIDATE_WEBHOOKS_KEY, WebhookReceiver, is_webhook_enabled
+from util.analysiscache import AnalysisCache, get_analyzer_version, hash_files, is_analysis_cache_enabled, list_files
+from util.analysiscache import select_files
+from util.analysiscache import MAX_CHANGED_RATIO, MAX_INCLUSIONS_LENGTH, NO_FILE_INCLUSION
+from util.projects import get_retention_days, is_keep_project_enabled, make_repository_key, prune_repository_projects
+from util.scannerreport import REPORT_DIR_NAME, ReportError, ScannerReport, is_offline_enabled
+from util.profilesync import ProfileSync, is_delta_sync_enabled
+from util.profiles import ProfileCache, RestoredProfiles, hash_file, is_profile_cache_enabled
+
+# 后台启动服务开关，默认开启
+OVERLAP_BOOT_ENV = "SQ_OVERLAP_BOOT"
+# 影响分析结果的环境变量，作为分析结果缓存的分区
+ANALYSIS_CACHE_OPTION_ENVS = (
+    "SQ_CLIENT_PARAMS",
+    "SQ_ANALYZE_OPTIONS",
+    "SONAR_SRC",
+    "SONAR_JAVA_SRC",
+    "SONAR_BIN",
+    "SONAR_LIB",
+    "SONAR_JAVA_VERSION",
+    "SONAR_BUILD_TYPE",
+    "SONAR_QUALITYPROFILE",
+    "SONAR_QUALITYPROFILE_TYPE",
+)
+# CE任务完成通知的webhook名
+WEBHOOK_NAME = "tca_ce_notify"
+# 查询CE任务状态的初始间隔，单位秒，之后指数增长到sleep_second
+CE_POLL_INTERVAL = 0.5
 
 
 class Sonar(SQBase):
@@ -58,6 +96,32 @@ class Sonar(SQBase):
         self.scannerwork = os.path.join(self.work_dir, "scannerwork")
 
         self.toscan_dir = os.path.join(self.work_dir, "toscan_dir")
+        # 问题记录共享的路径表和规则表
+        self.issue_tables = IssueTables()
+        # 任务规则目录，质量配置过滤和问题过滤共用
+        self.rule_catalog = RuleCatalog(self.params.get("rules"), self.params.get("rule_list"))
+        self._profile_lock = threading.Lock()
+
+        # 后台启动服务，与前置命令、编译并行
+        self._server_thread: threading.Thread = None
+        self._server_error: BaseException = None
+        self.is_prebuilt = False
+
+        # 文件分析结果缓存，只用于全量分析
+        self.analysis_cache: AnalysisCache = None
+        # 通过sonar.inclusions只分析了部分文件，服务端的项目统计数据不完整
+        self.is_partial_analysis = False
+        self._cached_files: Dict[str, List[dict]] = dict()
+        self._changed_hashes: Dict[str, str] = dict()
+
+        # 按代码库保留项目，任务结束后不删除
+        self.is_project_kept = False
+
+        # CE任务完成通知，只用于本地服务
+        self.webhook_receiver: WebhookReceiver = None
+        self.is_webhook_ready = False
+        # 关闭webhook校验之前的设置，None表示没有修改；空字符串表示原来使用默认值
+        self._validate_webhooks_value: str = None
 
     # =================================================================
     # API
@@ -82,14 +146,87 @@ class Sonar(SQBase):
             err=print,
         ).wait()
 
+    @contextmanager
+    def boot_server_in_background(self, languages):
+        """
+        在后台启动SQ Server，with块中执行不依赖服务的前置命令和编译，scan_proj在第一个依赖服务的步骤前等待启动完成
+        with块中出现异常时，等待启动结束后关闭服务
+        :param languages:
+        :return:
+        """
+        if os.environ.get(OVERLAP_BOOT_ENV, "true").lower() not in ("0", "false", "no", "off"):
+            print("[info] 后台启动SQ Server")
+            self._server_thread = threading.Thread(target=self._start_server, args=(languages,), daemon=True)
+            self._server_thread.start()
+        try:
+            yield
+        except BaseException:
+            if self._server_thread is not None:
+                self._server_thread.join()
+                self._server_thread = None
+                self.server.close()
+                self.server.release_instance()
+            raise
+
+    def _start_server(self, languages):
+        try:
+            self.server.start(languages)
+        except BaseException as e:
+            # 在scan_proj中抛出
+            self._server_error = e
+
+    def _wait_server(self, languages):
+        """
+        等待后台启动完成，没有后台启动时直接启动
+        """
+        if self._server_thread is None:
+            self.server.start(languages)
+            return
+        self._server_thread.join()
+        self._server_thread = None
+        print("[info] 后台启动SQ Server完成")
+        if self._server_error is not None:
+            error, self._server_error = self._server_error, None
+            raise error
+
+    def pre_build(self, build_type, build_cwd, build_cmd=None):
+        """
+        不依赖服务的编译步骤，在服务启动的同时执行
+        :param build_type:
+        :param build_cwd:
+        :param build_cmd:
+        :return:
+        """
+        if build_type.lower() in ("any", "no_build") and os.environ.get("SQ_JAVA_BUILD") and build_cmd:
+            # 编译失败的话，跳过
+            self.run_cmd(command=shlex.split(build_cmd), cwd=build_cwd)
+            self.is_prebuilt = True
+
     def scan_proj(self, scan_fun, languages, **fun_args):
+        """
+        扫描项目，以生成器的方式逐个返回问题，调用方需要遍历完所有问题，遍历结束后才会清理项目和关闭服务
+        出现异常或者调用方提前结束遍历时，关闭服务并归还多实例模式下的实例
+        """
+        try:
+            yield from self._scan_proj(scan_fun, languages, **fun_args)
+        finally:
+            self._close_webhook_receiver()
+            if self.server.is_instance_held():
+                self.server.close()
+                self.server.release_instance()
+
+    def _scan_proj(self, scan_fun, languages, **fun_args):
+        """
+        scan_proj的实现
+        """
         source_dir = self.source_dir
         work_dir = self.work_dir
-        rules = self.params["rules"]
+        rules = self.rule_catalog
         envs = os.environ
         is_quality = "SONAR_QUALITYPROFILE" in envs or "SONAR_QUALITYPROFILE_TYPE" in envs
 
-        self.server.start(languages)
+        self._wait_server(languages)
+        self._dump_startup_timeline(os.path.join(work_dir, "sq_startup_timeline.json"))
 
         if self.server.model == LOCAL_MODEL:
             no_proxy = envs.get("no_proxy", None)
@@ -105,58 +242,49 @@ class Sonar(SQBase):
             sonar_scanner_opts.append(envs.get("SONAR_SCANNER_OPTS", ""))
             envs["SONAR_SCANNER_OPTS"] = " ".join(sonar_scanner_opts)
 
+        # 按可用资源设置scanner的堆大小，用户已经设置的话不覆盖
+        if is_plan_enabled():
+            plan = self.server.resource_plan
+            if plan is None:
+                plan = ResourcePlan(local_server=self.server.model == LOCAL_MODEL)
+                plan.log()
+            scanner_java_opts = envs.get("SONAR_SCANNER_JAVA_OPTS", "")
+            if plan.is_feasible() and "-Xmx" not in scanner_java_opts and "-Xmx" not in envs.get("SONAR_SCANNER_OPTS", ""):
+                envs["SONAR_SCANNER_JAVA_OPTS"] = " ".join([plan.get_scanner_opts(), scanner_java_opts]).strip()
+
+        # scanner启动器和分析引擎的JVM使用CDS归档加速启动
+        if is_cds_enabled():
+            cds = CDSArchive()
+            if cds.is_supported():
+                envs["SONAR_SCANNER_JAVA_OPTS"] = " ".join(
+                    [envs.get("SONAR_SCANNER_JAVA_OPTS", ""), cds.get_opts("scanner")]
+                ).strip()
+                envs["SONAR_SCANNER_OPTS"] = " ".join([envs.get("SONAR_SCANNER_OPTS", ""), cds.get_opts("scanner-cli")]).strip()
+
+        self._use_repository_project()
         self.com_cmd = self._get_common_cmds()
         self._add_sonar_filter_path()
 
-        self._wait_until_project_create()
-
-        if envs.get("SONAR_DEVCOST", None):
-            self.server.sonar_handle.set_settings(
-                key="sonar.technicalDebt.developmentCost", value=int(envs.get("SONAR_DEVCOST", SONAR_DEVCOST))
-            )
-        if envs.get("SONAR_DEBT_RATINGGRID", None):
-            self.server.sonar_handle.set_settings(
-                key="sonar.technicalDebt.ratingGrid", value=envs.get("SONAR_DEBT_RATINGGRID", SONAR_DEBT_RATINGGRID)
-            )
-
-        self._set_qualityprofiles(self.server.sonar_handle, self.server.projectKey, languages)
-
-        sonar_report = scan_fun(**fun_args)
-        if envs.get("SONAR_REPORT", None):
-            sonar_report = os.path.join(source_dir, envs.get("SONAR_REPORT"))
-        if not sonar_report or not os.path.exists(sonar_report):
-            print(f"{sonar_report}结果文件不存在，开始遍历查找SQ分析结果文件...")
-            sonar_report_list = self.get_dir_files(source_dir, "report-task.txt".lower())
-            if self.scannerwork and os.path.exists(self.scannerwork):
-                sonar_report_list.extend(self.get_dir_files(self.scannerwork, "report-task.txt".lower()))
-            if sonar_report_list:
-                sonar_report = sonar_report_list[0]
-                print(f"查找到分析文件{sonar_report}")
-        print("[info] 结果文件是：%s" % sonar_report)
-        self._wait_until_task_succeed(self.server.sonar_handle, sonar_report)
-
-        self._dump_measures(
-            self.server.sonar_handle, self.server.projectKey, os.path.join(work_dir, "sonar_result.json")
-        )
-
-        issues = self.handle_issues(source_dir, languages, is_quality, rules)
+        self._plan_analysis_cache(scan_fun, languages, **fun_args)
+        issues = self._analyze(scan_fun, languages, is_quality, rules, **fun_args)
 
         incr_scan = self.params["incr_scan"]
-        if not incr_scan:
-            cogn_complex_cnt = 0
-            cogn_complex_sum = 0
-            cogn_complex_over = 0
-            for issue in issues:
-                if not issue["rule"].endswith(":S3776"):
-                    continue
+        cogn_complex_cnt = 0
+        cogn_complex_sum = 0
+        cogn_complex_over = 0
+        rule_table = self.issue_tables.rules
+        for issue in self._merge_cached_issues(issues):
+            if not incr_scan and rule_table.get(issue.rule_id).endswith(":S3776"):
                 # Refactor this method to reduce its Cognitive Complexity from 23 to the 10 allowed.
-                msg = issue["msg"]
-                info = [token for token in msg.split() if token.isdigit()]
-                if len(info) < 2:
-                    continue
-                cogn_complex_cnt += 1
-                cogn_complex_sum += int(info[0])
-                cogn_complex_over += int(info[0]) - int(info[1])
+                info = [token for token in issue.msg.split() if token.isdigit()]
+                if len(info) >= 2:
+                    cogn_complex_cnt += 1
+                    cogn_complex_sum += int(info[0])
+                    cogn_complex_over += int(info[0]) - int(info[1])
+            # 输出时才转换为dict
+            yield self.issue_tables.to_dict(issue)
+
+        if not incr_scan:
             if "summary" not in self.params:
                 self.params["summary"] = dict()
             self.params["summary"]["cogncomplexity"] = {
@@ -173,27 +301,262 @@ class Sonar(SQBase):
         if os.path.exists(self.toscan_dir):
             rmtree(self.toscan_dir)
 
-        self.server.sonar_handle.project_delete(project_key=self.server.projectKey)
+        if self.is_project_kept:
+            self._prune_repository_projects()
+        else:
+            self.server.sonar_handle.project_delete(project_key=self.server.projectKey)
+        print("[info] SQ API connection stats: %s" % json.dumps(self.server.sonar_handle.get_connection_stats()))
         print("[warning] Operation after ")
 
         self.server.close()
+        self.server.release_instance()
+
+    def _analyze(self, scan_fun, languages, is_quality, rules, **fun_args):
+        """
+        创建项目并执行分析
+        :return: 问题的迭代器
+        """
+        source_dir = self.source_dir
+        work_dir = self.work_dir
+        envs = os.environ
+
+        if self.server.model == LOCAL_MODEL and is_webhook_enabled() and not is_offline_enabled():
+            self.webhook_receiver = WebhookReceiver()
+            self.webhook_receiver.start()
+        self._setup_project(languages)
+
+        sonar_report = scan_fun(**fun_args)
+        if envs.get("SONAR_REPORT", None):
+            sonar_report = os.path.join(source_dir, envs.get("SONAR_REPORT"))
+        if not sonar_report or not os.path.exists(sonar_report):
+            print(f"{sonar_report}结果文件不存在，开始遍历查找SQ分析结果文件...")
+            sonar_report_list = self.get_dir_files(source_dir, "report-task.txt".lower())
+            if self.scannerwork and os.path.exists(self.scannerwork):
+                sonar_report_list.extend(self.get_dir_files(self.scannerwork, "report-task.txt".lower()))
+            if sonar_report_list:
+                sonar_report = sonar_report_list[0]
+                print(f"查找到分析文件{sonar_report}")
+        print("[info] 结果文件是：%s" % sonar_report)
+        report = self._load_scanner_report(sonar_report, is_quality)
+        if report is not None:
+            # 直接从scanner报告读取问题，不再等待CE处理，也不获取统计数据
+            # 保留的项目需要CE保存scanner的分析缓存，CE任务在后台继续执行
+            if not self.is_project_kept:
+                self._cancel_ce_task(self.server.sonar_handle, sonar_report)
+            issues = self.handle_report_issues(report, source_dir, languages, rules)
+        else:
+            self._wait_until_task_succeed(self.server.sonar_handle, sonar_report)
+            self._close_webhook_receiver()
 
+            if self.is_partial_analysis:
+                print("[info] 只分析了部分文件，项目统计数据不完整，不输出sonar_result.json")
+            else:
+                self._dump_measures(
+                    self.server.sonar_handle, self.server.projectKey, os.path.join(work_dir, "sonar_result.json")
+                )
+            issues = self.handle_issues(source_dir, languages, is_quality, rules)
         return issues
 
+    def _plan_analysis_cache(self, scan_fun, languages, build_cwd=None, **fun_args):
+        """
+        查找文件分析结果缓存，只把新增或者有变化的文件交给scanner
+        所有文件都命中缓存时仍然执行scanner，不分析文件，用于获取项目级别的问题
+        """
+        if not is_analysis_cache_enabled() or self.params["incr_scan"] or not build_cwd:
+            return
+        envs = os.environ
+        # 只用于sonar-scanner分析，构建工具的多模块路径无法对应
+        if scan_fun.__name__ == "scan_java_proj":
+            if fun_args.get("build_type", "").lower() not in ("any", "no_build"):
+                return
+            sources = envs.get("SONAR_JAVA_SRC", ".")
+        elif scan_fun.__name__ == "scan_not_build_proj":
+            sources = envs.get("SONAR_SRC", ".")
+        else:
+            return
+        if any(cmd.startswith("-Dsonar.inclusions=") for cmd in self.com_cmd):
+            # 无法计算与用户包含路径的交集
+            print("[info] 设置了包含路径，不使用分析结果缓存")
+            return
+        started = time()
+        options = [envs.get(name, "") for name in ANALYSIS_CACHE_OPTION_ENVS]
+        exclusions = [cmd for cmd in self.com_cmd if cmd.startswith("-Dsonar.exclusions=")]
+        options.extend(exclusions)
+        # 指定的质量配置文件按内容区分，修改配置文件后不使用旧的缓存
+        options.extend(hash_file(path) for path in self._get_custom_profile_paths())
+        namespace = hashlib.sha1(
+            json.dumps([self.rule_catalog.digest(), get_analyzer_version(), scan_fun.__name__, options]).encode()
+        ).hexdigest()
+        cache = AnalysisCache(namespace)
+
+        pos = len(self.source_dir) + 1
+        # 只计算scanner会分析的文件，用户修改了文件后缀配置时不按语言过滤
+        if "file.suffixes" in envs.get("SQ_ANALYZE_OPTIONS", ""):
+            languages = ""
+        exclusion_patterns = list()
+        for cmd in exclusions:
+            exclusion_patterns.extend(cmd[len("-Dsonar.exclusions=") :].strip('"').split(","))
+        hashes = hash_files(select_files(list_files(build_cwd), build_cwd, sources, languages, exclusion_patterns))
+        cached = dict()
+        changed = list()
+        for path, content_hash in hashes.items():
+            issues = cache.get(path[pos:], content_hash)
+            if issues is None:
+                changed.append(path)
+            else:
+                cached[path[pos:]] = issues
+        inclusions = [os.path.relpath(path, build_cwd).replace(os.sep, "/") for path in changed]
+        inclusions = ",".join(inclusions)
+        if changed and (
+            len(changed) > len(hashes) * MAX_CHANGED_RATIO
+            or len(inclusions) > MAX_INCLUSIONS_LENGTH
+            or any("," in path for path in changed)
+        ):
+            print("[info] 变化的文件较多，全量分析并更新缓存")
+            cached = dict()
+            changed = list(hashes.keys())
+        elif changed:
+            self.com_cmd.append("-Dsonar.inclusions=%s" % inclusions)
+            self.is_partial_analysis = True
+        else:
+            print("[info] 所有文件都命中分析结果缓存，scanner不分析文件")
+            self.com_cmd.append("-Dsonar.inclusions=%s" % NO_FILE_INCLUSION)
+            self.is_partial_analysis = True
+
+        self.analysis_cache = cache
+        self._cached_files = cached
+        self._changed_hashes = {path[pos:]: hashes[path] for path in changed}
+        info = {
+            "files": len(hashes),
+            "hits": len(cached),
+            "analyzed": len(changed),
+            "cost": round(time() - started, 3),
+        }
+        print("[info] 分析结果缓存: %s" % json.dumps(info))
+        if "summary" not in self.params:
+            self.params["summary"] = dict()
+        self.params["summary"]["sq_analysis_cache"] = info
+
+    def _get_custom_profile_paths(self):
+        """
+        SONAR_QUALITYPROFILE和SONAR_QUALITYPROFILE_TYPE指定的质量配置文件
+        """
+        envs = os.environ
+        paths = list()
+        if "SONAR_QUALITYPROFILE_TYPE" in envs:
+            paths.extend(
+                self.get_dir_files(
+                    os.path.join(settings.ROOT_DIR, "profiles"),
+                    f"_{envs.get('SONAR_QUALITYPROFILE_TYPE', '')}.xml".lower(),
+                )
+            )
+        if envs.get("SONAR_QUALITYPROFILE", None):
+            for path in str(envs.get("SONAR_QUALITYPROFILE")).split(";"):
+                profile_path = os.path.join(self.source_dir, path)
+                if os.path.exists(profile_path):
+                    paths.append(profile_path)
+        return sorted(paths)
+
+    def _merge_cached_issues(self, issues: Iterator[IssueRecord]) -> Iterator[IssueRecord]:
+        """
+        先返回分析得到的问题，再返回缓存的问题，全部返回后更新缓存
+        分析得到的问题边返回边暂存到缓存目录，内存中只保留文件路径
+        """
+        if self.analysis_cache is None:
+            for issue in issues:
+                yield issue
+            return
+        tables = self.issue_tables
+        cache = self.analysis_cache
+        fresh_paths = set()
+        is_cache_ok = True
+        try:
+            for issue in issues:
+                path = tables.paths.get(issue.path_id)
+                fresh_paths.add(path)
+                if is_cache_ok and path in self._changed_hashes:
+                    try:
+                        cache.stage(path, tables.to_dict(issue))
+                    except OSError as e:
+                        print("[warning] 暂存分析结果失败，不更新缓存: %s" % str(e))
+                        is_cache_ok = False
+                yield issue
+
+            for path, cached_issues in self._cached_files.items():
+                # 文件被scanner分析到时以分析结果为准
+                if path in fresh_paths:
+                    continue
+                for item in cached_issues:
+                    refs = tuple(
+                        tables.make_ref(ref["line"], ref["column"], ref["msg"], ref["path"]) for ref in item["refs"]
+                    )
+                    yield tables.make_issue(item["path"], item["rule"], item["msg"], item["line"], item["column"], refs)
+
+            if is_cache_ok:
+                try:
+                    for path, content_hash in self._changed_hashes.items():
+                        cache.commit(path, content_hash)
+                    cache.prune()
+                except OSError as e:
+                    print("[warning] 更新分析结果缓存失败: %s" % str(e))
+        finally:
+            cache.discard_staging()
+
     # =================================================================
     # common
     # =================================================================
 
-    def handle_issues(self, source_dir: str, languages: str, is_quality: bool, rules: List[str]) -> List:
+    def handle_issues(
+        self, source_dir: str, languages: str, is_quality: bool, rules: RuleCatalog
+    ) -> Iterator[IssueRecord]:
+        """
+        以生成器的方式逐个返回问题，保持接口返回的顺序
+        """
+        # 重复代码问题先占位，提前并发获取重复信息，信息就绪或者占位过多时再展开
+        dupl_cache = DuplicationCache(self.server.sonar_handle, self.issue_tables)
+        pending = deque()
+        try:
+            for item in self._iter_issues(source_dir, languages, is_quality, rules, dupl_cache):
+                pending.append(item)
+                while pending and (
+                    isinstance(pending[0], IssueRecord)
+                    or len(pending) > DUPLICATION_LOOKAHEAD
+                    or dupl_cache.is_ready(pending[0][0])
+                ):
+                    for issue in self._expand_issue(pending.popleft(), dupl_cache):
+                        yield issue
+            while pending:
+                for issue in self._expand_issue(pending.popleft(), dupl_cache):
+                    yield issue
+        finally:
+            dupl_cache.close()
+
+    @staticmethod
+    def _expand_issue(item, dupl_cache: DuplicationCache) -> Iterator[IssueRecord]:
+        if isinstance(item, IssueRecord):
+            yield item
+            return
+        component, issue = item
+        # 每个重复链是一个issue
+        for refs in dupl_cache.get(component):
+            yield IssueRecord(issue.path_id, issue.rule_id, issue.msg, issue.line, issue.column, refs)
+
+    def _iter_issues(
+        self, source_dir: str, languages: str, is_quality: bool, rules: RuleCatalog, dupl_cache: DuplicationCache
+    ):
         pos = len(source_dir) + 1
         envs = os.environ
         build_cwd = envs.get("BUILD_CWD", None)
         build_cwd = os.path.join(source_dir, build_cwd) if build_cwd else source_dir
-        issues = []
+        tables = self.issue_tables
         try:
             # 指定设置了质量配置文件后，不按照线上规则过滤
             for issue in self.server.sonar_handle.get_issues(
-                languages=languages, componentKeys=self.server.projectKey, rules=None if is_quality else ",".join(rules)
+                languages=languages,
+                componentKeys=self.server.projectKey,
+                rules=None if is_quality else rules.names,
+                # 保留的项目中有之前分析关闭的问题
+                resolved="false" if self.is_project_kept else None,
             ):
                 rule = issue["rule"]
                 if not is_quality and rules and rule not in rules:
@@ -212,47 +575,124 @@ class Sonar(SQBase):
 
                 # 获取重复代码规则的详细信息
                 if rule.endswith("DuplicatedBlocks"):
-                    dupl_blocks = self.server.sonar_handle.duplications_show(issue["component"])
-                    # 一个个重复链
-                    for dupl in dupl_blocks.get("duplications", list()):
-                        refs = list()
-                        # 重复链中的一个个重复块
-                        for block in dupl["blocks"]:
-                            refs.append(
-                                {
-                                    "line": block["from"],
-                                    "column": 0,
-                                    "msg": "重复块(%d行-%d行)" % (block["from"], block["from"] + block["size"] - 1),
-                                    "tag": None,
-                                    "path": dupl_blocks["files"][block["_ref"]]["name"],
-                                }
-                            )
-                        # 每个重复链是一个issue
-                        issues.append(
-                            {"path": path, "rule": rule, "msg": msg, "line": line, "column": column, "refs": refs}
-                        )
+                    dupl_cache.prefetch(issue["component"])
+                    yield issue["component"], tables.make_issue(path, rule, msg, line, column)
                 else:
                     # 获取问题追溯信息
                     refs = list()
                     for flow in issue.get("flows", []):
                         for location in flow.get("locations", []):
                             refs.append(
-                                {
-                                    "line": location["textRange"]["startLine"],
-                                    "column": location["textRange"]["startOffset"],
-                                    "msg": location.get("msg", ""),
-                                    "tag": None,
-                                    "path": location["component"].split(":")[-1],
-                                }
+                                tables.make_ref(
+                                    location["textRange"]["startLine"],
+                                    location["textRange"]["startOffset"],
+                                    location.get("msg", ""),
+                                    location["component"].split(":")[-1],
+                                )
                             )
-                    issues.append(
-                        {"path": path, "rule": rule, "msg": msg, "line": line, "column": column, "refs": refs}
-                    )
+                    yield tables.make_issue(path, rule, msg, line, column, tuple(refs))
         except ValidationError as e:
             # ValidationError: Can return only the first 10000 results. 10100th result asked.
             print("[info] exception: %s" % str(e))
 
-        return issues
+    def handle_report_issues(
+        self, report: ScannerReport, source_dir: str, languages: str, rules: RuleCatalog
+    ) -> Iterator[IssueRecord]:
+        """
+        从scanner报告中逐个返回问题，生成的记录与handle_issues一致
+        """
+        pos = len(source_dir) + 1
+        envs = os.environ
+        build_cwd = envs.get("BUILD_CWD", None)
+        build_cwd = os.path.join(source_dir, build_cwd) if build_cwd else source_dir
+        tables = self.issue_tables
+        language_set = set(languages.lower().split(",")) if languages else set()
+
+        for component, issue in report.iter_issues():
+            if rules and issue.rule not in rules:
+                continue
+            if language_set and component.language not in language_set:
+                continue
+            path = os.path.join(build_cwd, component.path)[pos:]
+            if issue.text_range:
+                line = issue.text_range[0]
+                column = issue.text_range[2]
+            else:
+                line = 0
+                column = 0
+            # 获取问题追溯信息
+            refs = list()
+            for flow in issue.flows:
+                for component_ref, text_range, msg in flow:
+                    refs.append(
+                        tables.make_ref(
+                            text_range[0], text_range[2], msg, report.get_path(component_ref, component.path)
+                        )
+                    )
+            yield tables.make_issue(path, issue.rule, issue.msg, line, column, tuple(refs))
+
+        # 重复代码问题由CE根据重复块生成，这里按同样的方式生成，每个重复链是一个issue
+        # 没有指定规则时与接口返回的结果一致，所有语言都生成重复代码问题
+        dupl_rules = {name.split(":")[0]: name for name in rules.names if name.endswith(":DuplicatedBlocks")}
+        for component, duplications in report.iter_duplications():
+            if rules:
+                rule = dupl_rules.get("common-%s" % component.language)
+            else:
+                rule = "common-%s:DuplicatedBlocks" % component.language
+            if not rule:
+                continue
+            path = os.path.join(build_cwd, component.path)[pos:]
+            msg = "%d duplicated blocks of code must be removed." % len(duplications)
+            for dupl in duplications:
+                blocks = [(component.ref, dupl.origin)] + dupl.duplicates
+                refs = tuple(
+                    tables.make_ref(
+                        text_range[0],
+                        0,
+                        "重复块(%d行-%d行)" % (text_range[0], text_range[1]),
+                        report.get_path(ref, component.path),
+                    )
+                    for ref, text_range in blocks
+                )
+                yield tables.make_issue(path, rule, msg, 0, 0, refs)
+
+    def _load_scanner_report(self, sonar_report, is_quality):
+        """
+        离线读取问题时加载scanner报告，不可用时返回None，使用服务端接口获取问题
+        """
+        if self.server.model != LOCAL_MODEL or not is_offline_enabled():
+            return None
+        if is_quality:
+            # 指定质量配置文件时不清楚重复代码规则是否开启
+            print("[info] 指定了质量配置文件，从服务端获取问题")
+            return None
+        if not sonar_report or not os.path.exists(sonar_report):
+            return None
+        report_dir = os.path.join(os.path.dirname(sonar_report), REPORT_DIR_NAME)
+        try:
+            report = ScannerReport(report_dir)
+        except (ReportError, OSError) as e:
+            print("[warning] scanner报告不可用，从服务端获取问题: %s" % str(e))
+            return None
+        print("[info] 从scanner报告读取问题: %s" % report_dir)
+        return report
+
+    @staticmethod
+    def _cancel_ce_task(sonar_handle: SQAPIHandler, sonar_report):
+        """
+        取消还没有开始处理的CE任务，已经开始处理的任务由服务端继续执行
+        """
+        with open(sonar_report) as f:
+            for line in f:
+                if line.startswith("ceTaskId="):
+                    task_id = line.strip().split("=", 1)[-1]
+                    break
+            else:
+                return
+        try:
+            sonar_handle.ce_cancel(id_=task_id)
+        except Exception as e:
+            print("[info] 取消CE任务(%s)失败: %s" % (task_id, str(e)))
 
     @staticmethod
     def check_usable():
@@ -289,9 +729,15 @@ class Sonar(SQBase):
         :param err_type:
         :return:
         """
-        if proj_del:
-            self.server.sonar_handle.project_delete(project_key=self.server.projectKey)
+        if proj_del and not self.is_project_kept:
+            try:
+                self.server.sonar_handle.project_delete(project_key=self.server.projectKey)
+            except ClientError as e:
+                # 项目还没有创建
+                print("[info] exception: %s" % str(e))
+        self._close_webhook_receiver()
         self.server.close()
+        self.server.release_instance()
         if err_type == "compile":
             raise CompileTaskError(msg)
         elif err_type == "config":
@@ -317,12 +763,25 @@ class Sonar(SQBase):
             id = f.readlines()[4].strip().split("=")[-1]
             print("[warning] Task ID is %s" % id)
         # 检测任务是否执行完成
-        timeout = time() + self.timeout
+        # 注册了webhook时等待服务端通知，同时以指数退避的间隔轮询作为兜底
+        started = time()
+        timeout = started + self.timeout
+        receiver = self.webhook_receiver if self.is_webhook_ready else None
+        interval = CE_POLL_INTERVAL
+        wait_path = "polling"
+        polls = 0
         is_success = False
         while not is_success:
             res = None
+            if receiver is not None and receiver.wait(id, interval):
+                wait_path = "webhook"
+                # 收到通知后只需要再查询一次任务详情
+                receiver = None
+            elif receiver is None:
+                sleep(interval)
+            interval = min(interval * 2, self.sleep_second)
             try:
-                sleep(self.sleep_second)
+                polls += 1
                 res = sonar_handle.ce_task(id_=id)
                 print("[info] Server response is %s" % str(res))
                 is_success = True if res["task"]["status"] == "SUCCESS" else False
@@ -354,6 +813,10 @@ class Sonar(SQBase):
             if timeout < time():
                 self._raise_error("判断任务执行是否执行完成操作超时，请查看log排查原因", err_type="analyze")
         print("[warning] Task completed.")
+        print("[info] 等待CE任务方式: %s, 耗时: %.1fs, 查询次数: %d" % (wait_path, time() - started, polls))
+        if "summary" not in self.params:
+            self.params["summary"] = dict()
+        self.params["summary"]["sq_ce_wait"] = {"path": wait_path, "cost": round(time() - started, 3), "polls": polls}
 
     def _wait_until_project_create(self):
         """
@@ -424,25 +887,210 @@ class Sonar(SQBase):
                 measures_result[value["metric"]] = int(measures_result[value["metric"]])
 
         # 传输给summary
-        self.params["summary"] = dict()
+        if "summary" not in self.params:
+            self.params["summary"] = dict()
         self.params["summary"]["sqdebt"] = measures_result
 
         print("[info] SQ result is %s" % str(measures_result))
         with open(dump_path, "w") as f:
             json.dump(measures_result, f, indent=2)
 
-    def _set_qualityprofiles(self, sonar_handle, project_key, languages):
+    def _dump_startup_timeline(self, dump_path):
         """
-        设置项目的质量配置
-        :param sonar_handle:
-        :param project_key:
+        记录SQ Server启动各阶段耗时
+        :param dump_path:
+        :return:
+        """
+        if not os.path.exists(os.path.dirname(dump_path)):
+            os.makedirs(os.path.dirname(dump_path))
+        self.server.timeline.dump(dump_path)
+        if "summary" not in self.params:
+            self.params["summary"] = dict()
+        self.params["summary"]["sq_startup"] = self.server.timeline.to_dict()
+
+    def _setup_project(self, languages):
+        """
+        扫描前的准备步骤: 创建项目、设置、导入质量配置并关联项目
+        各步骤按依赖关系并发执行:
+        - 创建项目、设置、各语言的质量配置导入之间没有依赖
+        - 关联质量配置依赖项目创建和该语言的质量配置导入
         :param languages:
         :return:
         """
+        envs = os.environ
+        sonar_handle = self.server.sonar_handle
+        project_key = self.server.projectKey
+        qualityprofile_filepaths = self._prepare_qualityprofiles(languages)
+
+        graph = TaskGraph()
+        graph.add("project_create", self._wait_until_project_create)
+        if envs.get("SONAR_DEVCOST", None):
+            graph.add(
+                "set_devcost",
+                partial(
+                    sonar_handle.set_settings,
+                    key="sonar.technicalDebt.developmentCost",
+                    value=int(envs.get("SONAR_DEVCOST", SONAR_DEVCOST)),
+                ),
+            )
+        if envs.get("SONAR_DEBT_RATINGGRID", None):
+            graph.add(
+                "set_ratinggrid",
+                partial(
+                    sonar_handle.set_settings,
+                    key="sonar.technicalDebt.ratingGrid",
+                    value=envs.get("SONAR_DEBT_RATINGGRID", SONAR_DEBT_RATINGGRID),
+                ),
+            )
+
+        # 本地服务记录已经导入的配置内容，内容不变时不重复导入；公共服务可能被其他客户端修改，每次都导入
+        restored = RestoredProfiles(self.server.sonarqube_home) if self.server.model == LOCAL_MODEL else None
+        # 增量同步时只对有变化的规则调用激活/停用接口
+        profile_sync = ProfileSync(sonar_handle) if is_delta_sync_enabled() else None
+        if self.webhook_receiver is not None:
+            graph.add("webhook_create", self._create_webhook, deps=["project_create"])
+        for lang, path in qualityprofile_filepaths.items():
+            graph.add("profile_%s" % lang, partial(self._upload_qualityprofile, sonar_handle, path, restored, profile_sync))
+            graph.add(
+                "add_project_%s" % lang,
+                partial(self._add_qualityprofile_project, sonar_handle, project_key, path),
+                deps=["project_create", "profile_%s" % lang],
+            )
+        graph.run()
+        graph.dump(os.path.join(self.work_dir, "sq_setup_graph.json"))
+        if "summary" not in self.params:
+            self.params["summary"] = dict()
+        self.params["summary"]["sq_setup"] = graph.to_dict()
+
+    def _create_webhook(self):
+        """
+        为项目注册CE任务完成通知，失败时使用轮询
+        """
+        sonar_handle = self.server.sonar_handle
+        # 公共服务上不修改全局的安全设置
+        if self.server.model != LOCAL_MODEL:
+            return
+        try:
+            # 常驻服务在启动时已经关闭校验，多个任务并发使用，不再逐个任务修改和恢复
+            if self.server.lease is None:
+                self._relax_webhook_validation(sonar_handle)
+            if self.is_project_kept:
+                # 清理之前任务注册的通知，每个项目最多注册10个webhook
+                for webhook in sonar_handle.webhooks_list(project=self.server.projectKey).get("webhooks", []):
+                    if webhook["name"] == WEBHOOK_NAME:
+                        sonar_handle.webhooks_delete(webhook["key"])
+            sonar_handle.webhooks_create(
+                name=WEBHOOK_NAME,
+                url=self.webhook_receiver.url,
+                project=self.server.projectKey,
+                secret=self.webhook_receiver.secret,
+            )
+            self.is_webhook_ready = True
+        except Exception as e:
+            print("[warning] 注册CE任务通知失败，使用轮询: %s" % str(e))
+
+    def _relax_webhook_validation(self, sonar_handle: SQAPIHandler) -> None:
+        """
+        关闭webhook校验，记录原有设置，关闭通知接收端时恢复
+        """
+        values = sonar_handle.get_settings(keys=VALIDATE_WEBHOOKS_KEY).json().get("settings", [])
+        previous = ""
+        for item in values:
+            if item.get("key") == VALIDATE_WEBHOOKS_KEY and not item.get("inherited", False):
+                previous = item.get("value", "")
+        sonar_handle.set_settings(key=VALIDATE_WEBHOOKS_KEY, value="false")
+        self._validate_webhooks_value = previous
+
+    def _close_webhook_receiver(self) -> None:
+        """
+        关闭CE任务通知接收端，恢复webhook校验设置
+        """
+        if self.webhook_receiver is not None:
+            self.webhook_receiver.close()
+            self.webhook_receiver = None
+        if self._validate_webhooks_value is None:
+            return
+        previous, self._validate_webhooks_value = self._validate_webhooks_value, None
+        sonar_handle = self.server.sonar_handle
+        try:
+            if previous:
+                sonar_handle.set_settings(key=VALIDATE_WEBHOOKS_KEY, value=previous)
+            else:
+                sonar_handle.reset_settings(keys=VALIDATE_WEBHOOKS_KEY)
+        except Exception as e:
+            print("[warning] 恢复webhook校验设置失败: %s" % str(e))
+
+    def _use_repository_project(self):
+        """
+        按代码库使用稳定的projectKey，保留项目以复用服务端的分析缓存
+        """
+        if not is_keep_project_enabled():
+            return
+        project_key = make_repository_key(self.params)
+        if not project_key:
+            print("[info] 缺少代码库地址和项目id，任务结束后不保留项目")
+            return
+        self.is_project_kept = self.server.use_repository_project(project_key)
+
+    def _prune_repository_projects(self):
+        """
+        清理长时间没有分析的保留项目，失败不影响任务结果
+        """
+        try:
+            keep_keys = [self.server.projectKey] + self.server.active_projects()
+            prune_repository_projects(self.server.sonar_handle, keep_keys, get_retention_days())
+        except Exception as e:
+            print("[warning] 清理保留项目失败: %s" % str(e))
+
+    @contextmanager
+    def _server_lock(self):
+        """
+        常驻模式下多个任务共享服务，导入质量配置和记录需要加锁；租约锁不是线程安全的，先加线程锁
+        """
+        if self.server.lease is None:
+            yield
+            return
+        with self._profile_lock, self.server.lease:
+            yield
+
+    def _upload_qualityprofile(self, sonar_handle, path, restored, profile_sync):
+        """
+        上传质量配置到Server
+        :param sonar_handle:
+        :param path: 质量配置文件
+        :param restored: 服务端已导入配置的记录，None表示不记录
+        :param profile_sync: 增量同步，None表示完整导入
+        :return:
+        """
+        info = self._get_profile_info(path)
+        # print("[warning] 设置项目质量配置文件: %s" % path)
+        with self._server_lock():
+            content_hash = hash_file(path)
+            if restored and restored.is_restored(info["lang"], info["name"], content_hash):
+                print("[info] 质量配置没有变化，跳过导入: %s" % os.path.basename(path))
+                return
+            if profile_sync:
+                mode = profile_sync.sync(path)
+                print("[info] 同步质量配置(%s): %s" % (mode, os.path.basename(path)))
+            else:
+                sonar_handle.qualityprofiles_restore(path)
+            if restored:
+                restored.record(info["lang"], info["name"], content_hash)
+
+    def _add_qualityprofile_project(self, sonar_handle, project_key, path):
+        # 关联质量配置和项目
+        info = self._get_profile_info(path)
+        sonar_handle.qualityprofiles_add_project(project=project_key, language=info["lang"], qualityProfile=info["name"])
+
+    def _prepare_qualityprofiles(self, languages):
+        """
+        生成项目使用的质量配置文件
+        :param languages:
+        :return: {语言: 质量配置文件}
+        """
         source_dir = self.source_dir
         work_dir = self.work_dir
-        rules = self.params["rules"]
-        rule_list = self.params.get("rule_list", [])
+        rules = self.rule_catalog
         envs = os.environ
         # sonarqube_home = envs.get("SONARQUBE_HOME")
         root_dir = settings.ROOT_DIR
@@ -453,6 +1101,8 @@ class Sonar(SQBase):
             os.path.join(root_dir, "profiles"), "_SonarQube_Profile.xml".lower()
         )
         qualityprofile_filepaths = dict()
+        # 默认配置文件的原始路径，过滤时从原始文件生成
+        source_filepaths = dict()
         profiles_path = os.path.join(work_dir, "profiles")
         if not os.path.exists(profiles_path):
             os.mkdir(profiles_path)
@@ -462,9 +1112,11 @@ class Sonar(SQBase):
             lang = profile_name.split("_")[0].lower()
             if self.server.model in (LOCAL_MODEL, COMMON_MODEL) and lang not in COMMON_SONAR_LANGS:
                 continue
-            profile_path = os.path.join(profiles_path, profile_name)
-            copyfile(profile, profile_path)
-            qualityprofile_filepaths[lang] = profile_path
+            # 裁剪插件后，服务没有加载的语言无法导入质量配置
+            if self.server.loaded_languages is not None and lang not in self.server.loaded_languages:
+                continue
+            qualityprofile_filepaths[lang] = os.path.join(profiles_path, profile_name)
+            source_filepaths[lang] = profile
 
         if "SONAR_QUALITYPROFILE_TYPE" in envs:
             print(f"启用{envs.get('SONAR_QUALITYPROFILE_TYPE', '')}模式配置文件")
@@ -484,61 +1136,84 @@ class Sonar(SQBase):
             for path in str(envs.get("SONAR_QUALITYPROFILE")).split(";"):
                 profile_path = os.path.join(source_dir, path)
                 if not os.path.exists(profile_path):
-                    self._raise_error(f"客户自主设置的配置文件({path})不存在, 请客户自查，填写正确的配置文件路径。", err_type="config")
+                    self._raise_error(
+                        f"客户自主设置的配置文件({path})不存在, 请客户自查，填写正确的配置文件路径。", proj_del=False, err_type="config"
+                    )
                 info = self._get_profile_info(profile_path)
                 if info["lang"] not in langs:
                     continue
                 qualityprofile_filepaths[info["lang"]] = profile_path
 
+        profile_cache = ProfileCache(rules.digest()) if is_profile_cache_enabled() else None
         for lang in qualityprofile_filepaths:
             profile_path = qualityprofile_filepaths[lang]
             if not profile_path.lower().endswith("_SonarQube_Profile.xml".lower()):
                 continue
-            # 配置规则
-            tree = ET.ElementTree(file=profile_path)
-            root = tree.getroot()
-            all_rules = root.find("rules")
-            removed_rules = list()
-            for rule in all_rules:
-                real_name = "%s:%s" % (rule.find("repositoryKey").text, rule.find("key").text)
-                if real_name not in rules:
-                    # 梳理没有使用的规则
-                    removed_rules.append(rule)
-                    continue
-                # 在规则列表中的规则，需要设置规则参数
-                rule_param = None
-                for rule_info in rule_list:
-                    if rule_info["name"] == real_name:
-                        rule_param = rule_info["params"]
-                        break
-                if not rule_param:
-                    continue
-                if "[sq]" not in rule_param:
-                    rule_param = "[sq]\n" + rule_param
-                rule_params_dict = ConfigReader(cfg_string=rule_param).read("sq")
-                if not rule_params_dict:
-                    continue
-                parameters = rule.find("parameters")
-                for parameter in parameters:
-                    key = parameter.find("key")
-                    value = parameter.find("value")
-                    if key.text in rule_params_dict:
-                        value.text = rule_params_dict[key.text]
-
-            for rule in removed_rules:
-                all_rules.remove(rule)
-            tree.write(profile_path)
-
-        # 上传质量配置到Server
-        for lang in qualityprofile_filepaths:
-            path = qualityprofile_filepaths[lang]
-            # print("[warning] 设置项目质量配置文件: %s" % path)
-            sonar_handle.qualityprofiles_restore(path)
-            # 关联质量配置和项目
-            info = self._get_profile_info(path)
-            sonar_handle.qualityprofiles_add_project(
-                project=project_key, language=info["lang"], qualityProfile=info["name"]
-            )
+            # 只有默认配置文件的副本从原始文件生成，其他配置文件(比如用户指定的)原地过滤
+            if lang in source_filepaths and profile_path == os.path.join(
+                profiles_path, os.path.basename(source_filepaths[lang])
+            ):
+                source_path = source_filepaths[lang]
+            else:
+                source_path = profile_path
+            if profile_cache:
+                profile_cache.filter(source_path, profile_path, self._filter_profile)
+            else:
+                self._filter_profile(source_path, profile_path)
+
+        # 常驻模式下多个任务共享服务，同名配置会被其他任务的导入覆盖，按配置内容区分配置名
+        if self.server.lease is not None and self.server.model == LOCAL_MODEL:
+            for lang in qualityprofile_filepaths:
+                qualityprofile_filepaths[lang] = self._isolate_profile(qualityprofile_filepaths[lang], profiles_path)
+
+        return qualityprofile_filepaths
+
+    def _isolate_profile(self, path, profiles_path):
+        """
+        生成以内容哈希为后缀命名的配置文件，内容相同的任务共用同一个配置，内容不同时不会互相覆盖
+        :param path: 质量配置文件
+        :param profiles_path: 生成的配置文件目录
+        :return: 生成的配置文件
+        """
+        tree = ET.ElementTree(file=path)
+        name = tree.getroot().find("name")
+        name.text = "%s_%s" % (name.text, hash_file(path)[:12])
+        dest_path = os.path.join(profiles_path, "isolated_%s" % os.path.basename(path))
+        tree.write(dest_path)
+        return dest_path
+
+    def _filter_profile(self, src_path, dest_path):
+        """
+        只保留任务规则列表中的规则，并设置规则参数
+        :param src_path: 原始配置文件
+        :param dest_path: 过滤后的配置文件
+        :return:
+        """
+        rules = self.rule_catalog
+        tree = ET.ElementTree(file=src_path)
+        root = tree.getroot()
+        all_rules = root.find("rules")
+        removed_rules = list()
+        for rule in all_rules:
+            real_name = "%s:%s" % (rule.find("repositoryKey").text, rule.find("key").text)
+            if real_name not in rules:
+                # 梳理没有使用的规则
+                removed_rules.append(rule)
+                continue
+            # 在规则列表中的规则，需要设置规则参数
+            rule_params_dict = rules.get_params(real_name)
+            if not rule_params_dict:
+                continue
+            parameters = rule.find("parameters")
+            for parameter in parameters:
+                key = parameter.find("key")
+                value = parameter.find("value")
+                if key.text in rule_params_dict:
+                    value.text = rule_params_dict[key.text]
+
+        for rule in removed_rules:
+            all_rules.remove(rule)
+        tree.write(dest_path)
 
     def _get_profile_info(self, path):
         """
@@ -569,6 +1244,12 @@ class Sonar(SQBase):
             "-Dsonar.sourceEncoding=UTF-8",
             "-Dsonar.working.directory=%s" % self.scannerwork,
         ]
+        # 保留项目时使用服务端保存的分析缓存
+        if self.is_project_kept:
+            cmds.append("-Dsonar.analysisCache.enabled=true")
+        # 离线读取问题时保留scanner报告
+        if self.server.model == LOCAL_MODEL and is_offline_enabled():
+            cmds.append("-Dsonar.scanner.keepReport=true")
 
         # 示例
         # SQ_CLIENT_PARAMS="-Dsonar.javascript.globals=;-Dsonar.javascript.environments="
@@ -652,7 +1333,8 @@ class Sonar(SQBase):
             # 先尝试编译，为了扫描对应的bin文件，获取更准确的结果
             # 没有设置编译命令的话，跳过
             # 编译失败的话，跳过
-            if os.environ.get("SQ_JAVA_BUILD") and build_cmd:
+            # 已经在服务启动的同时编译过的话，跳过
+            if os.environ.get("SQ_JAVA_BUILD") and build_cmd and not self.is_prebuilt:
                 self.run_cmd(command=shlex.split(build_cmd), cwd=build_cwd)
             build_cwd = self.update_sourcedir_while_incr(build_cwd)
             # https://docs.sonarqube.org/display/PLUG/Java+Plugin+and+Bytecode
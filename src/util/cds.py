@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# Copyright (c) 2025 THL A29 Limited
+#
+# This source code file is made available under LGPL License
+# See LICENSE for details
+# ==============================================================================
+
+"""
+JVM类数据共享(AppCDS)归档
+首次启动时通过-XX:ArchiveClassesAtExit在JVM退出时生成动态归档，后续启动通过-XX:SharedArchiveFile复用，
+缩短JVM启动和类加载耗时。归档按JRE(版本和路径)、SonarQube和scanner版本分目录，每个进程一个归档，版本变化后自动使用新的归档。
+同一时间只有一个JVM生成同一个归档，其他JVM本次不使用CDS。
+归档缺失或者失效时JVM默认-Xshare:auto，会忽略归档正常启动。
+"""
+
+import os
+import re
+import time
+import hashlib
+from typing import Dict
+
+import settings
+
+# CDS开关
+CDS_ENV = "SQ_JVM_CDS"
+# 动态归档需要JDK13及以上
+MIN_JAVA_VERSION = 13
+# 生成中的归档文件后缀，JVM退出时写入
+DUMP_SUFFIX = ".dump"
+# 生成中的归档超过该时间(秒)没有修改，认为已经写完
+DUMP_SETTLE_SECONDS = 60
+# 生成中的归档超过该时间(秒)仍为空，认为生成归档的JVM已经异常退出
+DUMP_CLAIM_TIMEOUT = 24 * 3600
+
+
+def is_cds_enabled() -> bool:
+    return os.environ.get(CDS_ENV, "").lower() in ("1", "true", "yes", "on")
+
+
+def get_java_version(java_home: str) -> str:
+    """
+    从JRE的release文件中读取版本号，比如17.0.11
+    """
+    release = os.path.join(java_home, "release")
+    if not os.path.exists(release):
+        return ""
+    with open(release, "r") as f:
+        match = re.search(r'^JAVA_VERSION="([^"]+)"', f.read(), re.M)
+    return match.group(1) if match else ""
+
+
+class CDSArchive(object):
+    def __init__(self, java_home: str = settings.SQ_JDK_HOME, run_user: str = None) -> None:
+        """
+        :param java_home: 运行JVM的JRE目录
+        :param run_user: 运行JVM的用户，root权限下以其他用户启动服务时指定，归档目录需要对该用户可写
+        """
+        self.java_home = java_home
+        self.run_user = run_user
+        self.java_version = get_java_version(java_home)
+        version_key = "%s_%s_%s_%s" % (
+            self.java_version,
+            hashlib.sha1(os.path.realpath(java_home).encode()).hexdigest()[:8],
+            os.path.basename(settings.SONARQUBE_HOME).split("-")[-1],
+            os.path.basename(settings.SONAR_SCANNER_HOME).split("-")[-1],
+        )
+        self.archive_dir = os.path.join(settings.TOOL_DIR, "cds", version_key)
+
+    def is_supported(self) -> bool:
+        major = self.java_version.split(".")[0]
+        if not major.isdigit() or int(major) < MIN_JAVA_VERSION:
+            return False
+        return self._prepare_dir()
+
+    def _prepare_dir(self) -> bool:
+        """
+        创建归档目录，目录对运行JVM的用户不可写时不使用CDS
+        """
+        try:
+            if not os.path.exists(self.archive_dir):
+                os.makedirs(self.archive_dir)
+            if self.run_user:
+                # 目录由当前(root)用户创建，以其他用户运行的JVM也需要写入归档
+                os.chmod(os.path.dirname(self.archive_dir), 0o777)
+                os.chmod(self.archive_dir, 0o777)
+        except OSError as err:
+            print("[warning] 无法准备CDS归档目录%s，不使用CDS: %s" % (self.archive_dir, str(err)))
+            return False
+        if not self.run_user and not os.access(self.archive_dir, os.W_OK):
+            print("[warning] CDS归档目录%s不可写，不使用CDS" % self.archive_dir)
+            return False
+        return True
+
+    def get_opts(self, name: str) -> str:
+        """
+        获取指定进程的CDS参数，归档存在则使用，不存在则在本次JVM退出时生成
+        :param name: 进程名，比如web、ce、scanner
+        :return: 其他JVM正在生成归档时返回空字符串
+        """
+        archive = os.path.join(self.archive_dir, "%s.jsa" % name)
+        self._collect(archive)
+        if os.path.exists(archive) and self._is_stale(archive):
+            print("[info] CDS归档已失效: %s" % archive)
+            os.remove(archive)
+        if os.path.exists(archive):
+            return "-XX:SharedArchiveFile=%s -Xshare:auto" % archive
+        # 只有抢到生成权的JVM生成归档，避免并发任务各自生成
+        dump = archive + DUMP_SUFFIX
+        try:
+            os.close(os.open(dump, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666))
+        except FileExistsError:
+            return ""
+        if self.run_user:
+            os.chmod(dump, 0o666)
+        return "-XX:ArchiveClassesAtExit=%s" % dump
+
+    def get_server_params(self) -> Dict[str, str]:
+        params = {
+            "sonar.web.javaAdditionalOpts": self.get_opts("web"),
+            "sonar.ce.javaAdditionalOpts": self.get_opts("ce"),
+        }
+        return {key: value for key, value in params.items() if value}
+
+    def _is_stale(self, archive: str) -> bool:
+        # 同版本号下JRE被替换，归档无法使用
+        modules = os.path.join(self.java_home, "lib", "modules")
+        return os.path.exists(modules) and os.path.getmtime(modules) > os.path.getmtime(archive)
+
+    @staticmethod
+    def _collect(archive: str) -> None:
+        """
+        收集已经写完的归档，清理生成失败的归档
+        """
+        dump = archive + DUMP_SUFFIX
+        try:
+            stat = os.stat(dump)
+        except OSError:
+            return
+        age = time.time() - stat.st_mtime
+        try:
+            if stat.st_size > 0 and age > DUMP_SETTLE_SECONDS:
+                os.replace(dump, archive)
+            elif stat.st_size == 0 and age > DUMP_CLAIM_TIMEOUT:
+                os.remove(dump)
+        except OSError:
+            # 其他任务已经处理
+            pass
@@ -11,8 +11,10 @@ import os
 import sys
 import json
 import psutil
+import signal
 import platform
 import stat
+from time import sleep, time
 from subprocess import Popen as p, PIPE as pi, STDOUT as sout
 from threading import Thread as t
 
@@ -112,6 +114,69 @@ def kill_proc_famliy(pid):
         print("[error] kill task failed: %s" % err)
 
 
+def _is_proc_alive(proc):
+    try:
+        return proc.is_running() and proc.status() != psutil.STATUS_ZOMBIE
+    except psutil.NoSuchProcess:
+        return False
+
+
+def _is_group_alive(pgid):
+    # leader是当前进程的子进程时先回收，避免僵尸进程让进程组一直存在
+    try:
+        os.waitpid(pgid, os.WNOHANG)
+    except ChildProcessError:
+        pass
+    try:
+        os.killpg(pgid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def kill_proc_group(pid, timeout=30):
+    """
+    关闭以pid为leader的进程组: 先发送SIGTERM，超时后发送SIGKILL，进程全部退出后立即返回
+    不在进程组中的子进程(比如sudo新建了会话)同样处理
+    :param pid:
+    :param timeout:
+    :return:
+    """
+    if not hasattr(os, "killpg"):
+        return kill_proc_famliy(pid)
+    try:
+        leader = psutil.Process(pid)
+        procs = [leader] + leader.children(recursive=True)
+    except psutil.NoSuchProcess:
+        procs = list()
+
+    def send(sig):
+        try:
+            os.killpg(pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+        for proc in procs:
+            try:
+                proc.send_signal(sig)
+            except psutil.NoSuchProcess:
+                pass
+            except Exception as err:
+                print("[error] kill proc failed: %s" % err)
+
+    print("[info] kill process group: %d" % pid)
+    for sig, wait_time in ((signal.SIGTERM, timeout), (signal.SIGKILL, 5)):
+        send(sig)
+        deadline = time() + wait_time
+        while time() < deadline:
+            procs = [proc for proc in procs if _is_proc_alive(proc)]
+            if not procs and not _is_group_alive(pid):
+                return
+            sleep(0.05)
+        print("[warning] process group %d is still alive after %s" % (pid, sig.name))
+
+
 def generate_shell_file(cmd, shell_name="build"):
     work_dir = os.getcwd()
     if platform.system() == "Windows":
@@ -143,14 +208,18 @@ def decode(line):
 
 
 class Process(object):
-    def __init__(self, command, cwd=None, out=None, err=None, shell=False):
+    def __init__(self, command, cwd=None, out=None, err=None, shell=False, start_new_session=False):
         # print(" ".join(command))
         if shell : command = " ".join(command)
         self.p = None
         out_t = None
         err_t = None
         try:
-            self.p = p(command, cwd=cwd, stdout=pi, stderr=pi, shell=shell)
+            # start_new_session: 新建会话和进程组，便于整组关闭
+            if start_new_session and sys.platform != "win32":
+                self.p = p(command, cwd=cwd, stdout=pi, stderr=pi, shell=shell, start_new_session=True)
+            else:
+                self.p = p(command, cwd=cwd, stdout=pi, stderr=pi, shell=shell)
             if out:
                 out_t = t(target=self.do, args=(self.p.stdout, out))
                 out_t.start()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# Copyright (c) 2025 THL A29 Limited
+#
+# This source code file is made available under LGPL License
+# See LICENSE for details
+# ==============================================================================
+
+"""
+重复代码信息缓存
+按文件缓存duplications_show的结果，遍历问题时提前并发获取，每个文件只请求一次
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+from util.issues import IssueTables, RefTuple
+
+# 并发获取重复代码信息的线程数，不超过API连接池大小
+DUPLICATION_WORKERS = 8
+# 流式返回问题时最多等待的占位问题数
+DUPLICATION_LOOKAHEAD = 1000
+
+
+class DuplicationCache(object):
+    def __init__(self, sonar_handle, tables: IssueTables, max_workers: int = DUPLICATION_WORKERS) -> None:
+        self.sonar_handle = sonar_handle
+        self.tables = tables
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._futures = dict()
+
+    def prefetch(self, component: str) -> None:
+        """
+        提交获取任务，不等待结果
+        """
+        if component not in self._futures:
+            self._futures[component] = self._executor.submit(self._load, component)
+
+    def is_ready(self, component: str) -> bool:
+        future = self._futures.get(component)
+        return future is not None and future.done()
+
+    def get(self, component: str) -> List[Tuple[RefTuple, ...]]:
+        """
+        获取文件的重复链列表，每个重复链是一组重复块
+        """
+        self.prefetch(component)
+        return self._futures[component].result()
+
+    def close(self) -> None:
+        for future in self._futures.values():
+            future.cancel()
+        self._executor.shutdown(wait=True)
+        self._futures = dict()
+
+    def _load(self, component: str) -> List[Tuple[RefTuple, ...]]:
+        res = self.sonar_handle.duplications_show(component)
+        # 每个响应只解析一次_ref对应的文件名
+        names = {ref: info["name"] for ref, info in res.get("files", dict()).items()}
+        chains = list()
+        for dupl in res.get("duplications", list()):
+            chains.append(
+                tuple(
+                    self.tables.make_ref(
+                        block["from"],
+                        0,
+                        "重复块(%d行-%d行)" % (block["from"], block["from"] + block["size"] - 1),
+                        names[block["_ref"]],
+                    )
+                    for block in dupl["blocks"]
+                )
+            )
+        return chains
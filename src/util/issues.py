@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# Copyright (c) 2025 THL A29 Limited
+#
+# This source code file is made available under LGPL License
+# See LICENSE for details
+# ==============================================================================
+
+"""
+紧凑的问题记录
+问题在内部使用__slots__对象保存，路径和规则名放到字符串表中只保存一份，记录中只保存下标；
+追溯信息使用元组保存。只在输出结果时转换为dict。
+"""
+
+import threading
+from typing import Dict, List, Tuple
+
+# 追溯信息: (line, column, msg, path_id)
+RefTuple = Tuple[int, int, str, int]
+
+
+class StringTable(object):
+    __slots__ = ("values", "index", "_lock")
+
+    def __init__(self) -> None:
+        self.values: List[str] = list()
+        self.index: Dict[str, int] = dict()
+        # 重复代码信息在线程池中获取，新增时需要加锁
+        self._lock = threading.Lock()
+
+    def add(self, value: str) -> int:
+        idx = self.index.get(value)
+        if idx is not None:
+            return idx
+        with self._lock:
+            idx = self.index.get(value)
+            if idx is None:
+                idx = len(self.values)
+                self.values.append(value)
+                self.index[value] = idx
+        return idx
+
+    def get(self, idx: int) -> str:
+        return self.values[idx]
+
+
+class IssueTables(object):
+    """
+    一次任务内共享的路径表和规则表
+    """
+
+    def __init__(self) -> None:
+        self.paths = StringTable()
+        self.rules = StringTable()
+
+    def make_issue(self, path: str, rule: str, msg: str, line: int, column: int, refs: Tuple = ()) -> "IssueRecord":
+        return IssueRecord(self.paths.add(path), self.rules.add(rule), msg, line, column, refs)
+
+    def make_ref(self, line: int, column: int, msg: str, path: str) -> RefTuple:
+        return line, column, msg, self.paths.add(path)
+
+    def to_dict(self, issue: "IssueRecord") -> dict:
+        """
+        转换为结果文件中的格式
+        """
+        paths = self.paths.values
+        return {
+            "path": paths[issue.path_id],
+            "rule": self.rules.values[issue.rule_id],
+            "msg": issue.msg,
+            "line": issue.line,
+            "column": issue.column,
+            "refs": [
+                {"line": line, "column": column, "msg": msg, "tag": None, "path": paths[path_id]}
+                for line, column, msg, path_id in issue.refs
+            ],
+        }
+
+
+class IssueRecord(object):
+    __slots__ = ("path_id", "rule_id", "msg", "line", "column", "refs")
+
+    def __init__(self, path_id: int, rule_id: int, msg: str, line: int, column: int, refs: Tuple = ()) -> None:
+        self.path_id = path_id
+        self.rule_id = rule_id
+        self.msg = msg
+        self.line = line
+        self.column = column
+        self.refs = refs
@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# Copyright (c) 2025 THL A29 Limited
+#
+# This source code file is made available under LGPL License
+# See LICENSE for details
+# ==============================================================================
+
+"""
+常驻SQ Server模式
+多个任务共享同一个本地SonarQube服务，通过lock文件和租约(lease)文件协调:
+- 第一个任务负责启动服务，并拉起一个watchdog进程
+- 后续任务直接复用已启动的服务，每个任务使用独立的projectKey
+- 没有租约且空闲超过指定时间后，由watchdog关闭服务
+"""
+
+import os
+import sys
+import json
+import socket
+import subprocess
+from time import sleep, time
+
+import psutil
+
+try:
+    import fcntl
+except ImportError:
+    # windows下不支持常驻模式
+    fcntl = None
+
+
+# 常驻模式开关
+PERSISTENT_ENV = "SQ_PERSISTENT_SERVER"
+# 空闲多久后关闭服务，单位秒
+IDLE_TIMEOUT = 1800
+# 每执行多少个任务做一次清理
+HOUSEKEEPING_TASKS = 20
+# 执行多少个任务后重启服务，重建H2和ES数据
+RECYCLE_TASKS = 500
+# watchdog检测间隔，单位秒
+WATCH_INTERVAL = 30
+
+
+def is_persistent_enabled() -> bool:
+    if os.environ.get(PERSISTENT_ENV, "").lower() not in ("1", "true", "yes", "on"):
+        return False
+    if fcntl is None:
+        print("[warning] 当前平台不支持SQ Server常驻模式，使用默认模式")
+        return False
+    return True
+
+
+class ServerLease(object):
+    def __init__(self, sonarqube_home: str) -> None:
+        envs = os.environ
+        self.sonarqube_home = sonarqube_home
+        self.lock_path = os.path.join(sonarqube_home, ".sq_persistent.lock")
+        self.state_path = os.path.join(sonarqube_home, ".sq_persistent.json")
+        self.lease_id = "%s_%d_%d" % (socket.gethostname(), os.getpid(), int(time()))
+        self.idle_timeout = int(envs.get("SQ_PERSISTENT_IDLE_TIMEOUT", IDLE_TIMEOUT))
+        self.housekeeping_tasks = int(envs.get("SQ_PERSISTENT_HOUSEKEEPING_TASKS", HOUSEKEEPING_TASKS))
+        self.recycle_tasks = int(envs.get("SQ_PERSISTENT_RECYCLE_TASKS", RECYCLE_TASKS))
+        self.is_acquired = False
+
+        self._lock_fd = None
+        self._lock_depth = 0
+
+    # =================================================================
+    # lock
+    # =================================================================
+
+    def __enter__(self):
+        # 可重入，避免同一进程内重复加锁导致死锁
+        if self._lock_depth == 0:
+            self._lock_fd = open(self.lock_path, "a")
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        self._lock_depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self._lock_depth -= 1
+        if self._lock_depth == 0:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+            self._lock_fd.close()
+            self._lock_fd = None
+
+    # =================================================================
+    # state
+    # =================================================================
+
+    def read_state(self) -> dict:
+        if not os.path.exists(self.state_path):
+            return dict()
+        try:
+            with open(self.state_path, "r") as f:
+                return json.load(f)
+        except ValueError as e:
+            print("[warning] 常驻服务状态文件损坏，忽略: %s" % str(e))
+            return dict()
+
+    def write_state(self, state: dict) -> None:
+        temp_path = self.state_path + ".temp"
+        with open(temp_path, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(temp_path, self.state_path)
+
+    def clear_state(self) -> None:
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+
+    @staticmethod
+    def is_server_alive(state: dict) -> bool:
+        pid = state.get("pid")
+        return bool(pid) and psutil.pid_exists(pid)
+
+    @staticmethod
+    def prune_leases(state: dict) -> None:
+        """
+        清理异常退出任务遗留的租约
+        """
+        leases = state.get("leases", dict())
+        for lease_id in list(leases.keys()):
+            if not psutil.pid_exists(leases[lease_id]["pid"]):
+                print("[info] 清理失效租约: %s" % lease_id)
+                del leases[lease_id]
+
+    def need_recycle(self, state: dict) -> bool:
+        return state.get("tasks", 0) >= self.recycle_tasks and not state.get("leases")
+
+    def new_state(self, pid: int, port: int) -> dict:
+        return {
+            "pid": pid,
+            "port": port,
+            "started": time(),
+            "last_release": time(),
+            "tasks": 0,
+            "leases": dict(),
+            "watchdog_pid": None,
+        }
+
+    # =================================================================
+    # lease
+    # =================================================================
+
+    def acquire(self, state: dict, project_key: str) -> None:
+        self.prune_leases(state)
+        state["leases"][self.lease_id] = {"pid": os.getpid(), "project": project_key, "since": time()}
+        state["tasks"] = state.get("tasks", 0) + 1
+        self.is_acquired = True
+        print("[info] 获取常驻服务租约: %s, 当前租约数: %d" % (self.lease_id, len(state["leases"])))
+
+    def release(self) -> dict:
+        """
+        释放租约，返回释放后的状态
+        """
+        with self:
+            state = self.read_state()
+            state.get("leases", dict()).pop(self.lease_id, None)
+            self.prune_leases(state)
+            state["last_release"] = time()
+            if state:
+                self.write_state(state)
+        self.is_acquired = False
+        print("[info] 释放常驻服务租约: %s" % self.lease_id)
+        return state
+
+    def claim_project(self, project_key: str) -> bool:
+        """
+        登记任务使用的项目，其他任务正在使用同一个项目时返回False
+        """
+        with self:
+            state = self.read_state()
+            self.prune_leases(state)
+            leases = state.get("leases", dict())
+            for lease_id, lease in leases.items():
+                if lease_id != self.lease_id and lease["project"] == project_key:
+                    return False
+            if self.lease_id in leases:
+                leases[self.lease_id]["project"] = project_key
+                self.write_state(state)
+        return True
+
+    def need_housekeeping(self, state: dict) -> bool:
+        return self.housekeeping_tasks > 0 and state.get("tasks", 0) % self.housekeeping_tasks == 0
+
+    def active_projects(self, state: dict) -> list:
+        return [lease["project"] for lease in state.get("leases", dict()).values()]
+
+    # =================================================================
+    # watchdog
+    # =================================================================
+
+    def ensure_watchdog(self, state: dict) -> None:
+        watchdog_pid = state.get("watchdog_pid")
+        if watchdog_pid and psutil.pid_exists(watchdog_pid):
+            return
+        p = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "watch", self.sonarqube_home],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        state["watchdog_pid"] = p.pid
+        print("[info] 启动常驻服务watchdog: %d" % p.pid)
+
+    def shutdown_server(self, state: dict) -> None:
+        """
+        关闭常驻服务，调用前需要持有锁
+        """
+        from util.common import kill_proc_group
+        from util.profiles import RestoredProfiles
+
+        if self.is_server_alive(state):
+            print("[info] 关闭常驻SQ Server: %d" % state["pid"])
+            kill_proc_group(state["pid"])
+        pid_file = os.path.join(self.sonarqube_home, ".sq_server.pid")
+        if os.path.exists(pid_file):
+            os.remove(pid_file)
+        db_path = os.path.join(self.sonarqube_home, "data", "sonar.mv.db")
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        RestoredProfiles(self.sonarqube_home).clear()
+        self.clear_state()
+
+    def watch(self) -> None:
+        """
+        watchdog主循环: 服务空闲超时或者需要重建时关闭服务
+        """
+        while True:
+            sleep(WATCH_INTERVAL)
+            with self:
+                state = self.read_state()
+                if not state or not self.is_server_alive(state):
+                    self.clear_state()
+                    return
+                if state.get("watchdog_pid") != os.getpid():
+                    # 已经有新的watchdog接管
+                    return
+                self.prune_leases(state)
+                if not state["leases"] and (
+                    time() - state.get("last_release", 0) > self.idle_timeout or self.need_recycle(state)
+                ):
+                    self.shutdown_server(state)
+                    return
+                self.write_state(state)
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if len(sys.argv) == 3 and sys.argv[1] == "watch":
+        ServerLease(sys.argv[2]).watch()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# Copyright (c) 2025 THL A29 Limited
+#
+# This source code file is made available under LGPL License
+# See LICENSE for details
+# ==============================================================================
+
+"""
+按语言裁剪SQ Server加载的插件
+为每个语言集合生成一个SonarQube目录的覆盖层(overlay)，只链接需要的内置插件，
+其余文件通过软链接复用原目录，conf、bin、data、logs、temp各自独立。
+多实例模式下每个实例同样使用独立的覆盖层目录。
+"""
+
+import os
+import sys
+import hashlib
+from shutil import copyfile, copytree, rmtree
+from typing import List
+
+# 插件裁剪开关
+PRUNE_ENV = "SQ_PRUNE_PLUGINS"
+
+# 语言到内置插件的映射，按插件文件名前缀匹配
+# 不在映射中的插件视为通用插件，始终加载
+LANGUAGE_PLUGINS = {
+    "azureresourcemanager": ["sonar-iac-plugin"],
+    "cloudformation": ["sonar-iac-plugin"],
+    "cs": ["sonar-csharp-plugin"],
+    "css": ["sonar-javascript-plugin"],
+    "docker": ["sonar-iac-plugin"],
+    "flex": ["sonar-flex-plugin"],
+    "go": ["sonar-go-plugin"],
+    # jsp由html插件分析
+    "java": ["sonar-java-plugin", "sonar-java-symbolic-execution-plugin", "sonar-jacoco-plugin", "sonar-html-plugin"],
+    "js": ["sonar-javascript-plugin"],
+    "kotlin": ["sonar-kotlin-plugin"],
+    "kubernetes": ["sonar-iac-plugin"],
+    "php": ["sonar-php-plugin"],
+    "py": ["sonar-python-plugin"],
+    "ruby": ["sonar-ruby-plugin"],
+    "scala": ["sonar-scala-plugin"],
+    "secrets": ["sonar-text-plugin"],
+    "terraform": ["sonar-iac-plugin"],
+    "text": ["sonar-text-plugin"],
+    "ts": ["sonar-javascript-plugin"],
+    "vbnet": ["sonar-vbnet-plugin"],
+    "web": ["sonar-html-plugin"],
+    "xml": ["sonar-xml-plugin"],
+}
+
+# 覆盖层中独立的目录
+PRIVATE_DIRS = ("data", "logs", "temp")
+# 覆盖层中复制的目录，启动脚本和配置会被修改或者按相对路径定位SonarQube目录
+COPIED_DIRS = ("bin", "conf")
+
+
+def is_pruning_enabled() -> bool:
+    if os.environ.get(PRUNE_ENV, "").lower() not in ("1", "true", "yes", "on"):
+        return False
+    if sys.platform == "win32":
+        print("[warning] windows下不支持插件裁剪，加载全部插件")
+        return False
+    return True
+
+
+class PluginOverlay(object):
+    def __init__(self, sonarqube_home: str, languages: str) -> None:
+        self.sonarqube_home = os.path.normpath(sonarqube_home)
+        self.languages = [lang.strip().lower() for lang in languages.split(",") if lang.strip()]
+        self.plugin_dir = os.path.join(self.sonarqube_home, "lib", "extensions")
+
+    def is_supported(self) -> bool:
+        """
+        只有所有语言都在映射中才能裁剪，否则无法确定需要的插件
+        """
+        return bool(self.languages) and all(lang in LANGUAGE_PLUGINS for lang in self.languages)
+
+    def get_plugins(self) -> List[str]:
+        """
+        获取需要加载的内置插件
+        """
+        wanted = set()
+        for lang in self.languages:
+            wanted.update(LANGUAGE_PLUGINS[lang])
+        known = set()
+        for prefixes in LANGUAGE_PLUGINS.values():
+            known.update(prefixes)
+
+        plugins = list()
+        for name in sorted(os.listdir(self.plugin_dir)):
+            if not name.endswith(".jar"):
+                continue
+            prefix = self._match_prefix(name, known)
+            if prefix is None or prefix in wanted:
+                plugins.append(name)
+        return plugins
+
+    @staticmethod
+    def _match_prefix(name: str, prefixes: set) -> str:
+        # 取最长匹配，避免sonar-java-plugin匹配到其他插件
+        matched = None
+        for prefix in prefixes:
+            if name.startswith(prefix + "-") and (matched is None or len(prefix) > len(matched)):
+                matched = prefix
+        return matched
+
+    def prepare(self, instance: int = None) -> str:
+        """
+        生成覆盖层目录，插件集合与原目录一致时直接使用原目录
+        :param instance: 多实例模式下的实例编号，每个实例使用独立的覆盖层目录
+        :return: 服务启动使用的SonarQube目录
+        """
+        if self.is_supported():
+            plugins = self.get_plugins()
+        else:
+            plugins = sorted(name for name in os.listdir(self.plugin_dir) if name.endswith(".jar"))
+        all_plugins = [name for name in os.listdir(self.plugin_dir) if name.endswith(".jar")]
+        if len(plugins) == len(all_plugins) and instance is None:
+            return self.sonarqube_home
+
+        key = hashlib.sha1(",".join(plugins).encode()).hexdigest()[:12]
+        if instance is not None:
+            key = "%s_%d" % (key, instance)
+        overlay_root = os.path.join(os.path.dirname(self.sonarqube_home), "sq_overlays")
+        overlay_home = os.path.join(overlay_root, "%s_%s" % (os.path.basename(self.sonarqube_home), key))
+        if len(plugins) != len(all_plugins):
+            print("[info] 裁剪SQ Server插件，加载: %s" % ", ".join(plugins))
+        if not os.path.exists(os.path.join(overlay_home, "lib", "extensions")):
+            self._build(overlay_home, plugins)
+        return overlay_home
+
+    def _build(self, overlay_home: str, plugins: List[str]) -> None:
+        # 先在临时目录生成，完成后再改名，避免并发任务使用不完整的目录
+        temp_home = "%s.%d" % (overlay_home, os.getpid())
+        os.makedirs(temp_home)
+        for name in os.listdir(self.sonarqube_home):
+            src = os.path.join(self.sonarqube_home, name)
+            dst = os.path.join(temp_home, name)
+            if name.startswith(".") or name in ("snapshots",):
+                continue
+            elif name in PRIVATE_DIRS:
+                os.makedirs(dst)
+            elif name in COPIED_DIRS:
+                copytree(src, dst, symlinks=True)
+            elif name == "lib":
+                os.makedirs(dst)
+                for lib_name in os.listdir(src):
+                    if lib_name != "extensions":
+                        os.symlink(os.path.join(src, lib_name), os.path.join(dst, lib_name))
+                os.makedirs(os.path.join(dst, "extensions"))
+                for plugin in plugins:
+                    os.symlink(os.path.join(self.plugin_dir, plugin), os.path.join(dst, "extensions", plugin))
+            else:
+                os.symlink(src, dst)
+        # sonar.properties.temp是任务运行期间的备份，不需要复制
+        temp_property = os.path.join(temp_home, "conf", "sonar.properties.temp")
+        if os.path.exists(temp_property):
+            copyfile(temp_property, os.path.join(temp_home, "conf", "sonar.properties"))
+            os.remove(temp_property)
+        try:
+            os.rename(temp_home, overlay_home)
+        except OSError:
+            # 其他任务已经生成
+            rmtree(temp_home, ignore_errors=True)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# Copyright (c) 2025 THL A29 Limited
+#
+# This source code file is made available under LGPL License
+# See LICENSE for details
+# ==============================================================================
+
+"""
+本机多实例SQ Server池
+同一台机器上并发的任务各自使用一个独立的服务实例，每个实例有独立的端口、data和temp目录。
+实例数上限由SQ_SERVER_POOL指定，同时受内存总量限制；启动新实例时空闲内存不足的话，等待其他实例释放。
+"""
+
+import os
+import json
+from time import sleep, time
+
+import psutil
+
+from util.resources import get_available_memory, get_memory_limit, get_instance_min_memory, MB
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# 多实例模式开关，值为实例数上限
+POOL_ENV = "SQ_SERVER_POOL"
+
+
+def get_pool_size() -> int:
+    """
+    获取实例数上限，未开启时返回0
+    """
+    value = os.environ.get(POOL_ENV, "")
+    if not value.isdigit() or int(value) < 1:
+        return 0
+    if fcntl is None:
+        print("[warning] 当前平台不支持SQ Server多实例模式，使用默认模式")
+        return 0
+    # 内存总量决定最多能同时运行的实例数，实际能否启动新实例由获取实例时的空闲内存决定
+    memory_size = max(get_memory_limit() // MB // get_instance_min_memory(), 1)
+    return min(int(value), memory_size)
+
+
+class ServerPool(object):
+    def __init__(self, pool_root: str, size: int, sleep_second: int = 5) -> None:
+        self.size = size
+        self.sleep_second = sleep_second
+        if not os.path.exists(pool_root):
+            os.makedirs(pool_root)
+        self.lock_path = os.path.join(pool_root, ".sq_pool.lock")
+        self.state_path = os.path.join(pool_root, ".sq_pool.json")
+        self.slot: int = None
+
+    def acquire(self, timeout: int) -> int:
+        """
+        获取一个空闲实例，实例都被占用时等待
+        :param timeout:
+        :return: 实例编号
+        """
+        deadline = time() + timeout
+        print("[info] 等待SQ Server实例, 实例数上限: %d" % self.size)
+        is_memory_logged = False
+        while True:
+            with open(self.lock_path, "a") as lock_fd:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+                state = self._read_state()
+                # 已有实例在运行时，空闲内存不足以再启动一个实例的话继续等待
+                is_memory_enough = not state or get_available_memory() // MB >= get_instance_min_memory()
+                if not is_memory_enough and not is_memory_logged:
+                    print("[info] 空闲内存不足，等待其他SQ Server实例释放")
+                    is_memory_logged = True
+                for slot in range(self.size if is_memory_enough else 0):
+                    if str(slot) not in state:
+                        state[str(slot)] = {"pid": os.getpid(), "since": time()}
+                        self._write_state(state)
+                        self.slot = slot
+                        print("[info] 使用SQ Server实例: %d" % slot)
+                        return slot
+            if deadline < time():
+                raise TimeoutError("Wait for SQ Server instance timeout")
+            sleep(self.sleep_second)
+
+    def release(self) -> None:
+        if self.slot is None:
+            return
+        with open(self.lock_path, "a") as lock_fd:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            state = self._read_state()
+            state.pop(str(self.slot), None)
+            self._write_state(state)
+        print("[info] 释放SQ Server实例: %d" % self.slot)
+        self.slot = None
+
+    def _read_state(self) -> dict:
+        if not os.path.exists(self.state_path):
+            return dict()
+        try:
+            with open(self.state_path, "r") as f:
+                state = json.load(f)
+        except ValueError:
+            return dict()
+        # 任务进程退出后实例自动释放
+        return {slot: info for slot, info in state.items() if psutil.pid_exists(info["pid"])}
+
+    def _write_state(self, state: dict) -> None:
+        with open(self.state_path, "w") as f:
+            json.dump(state, f, indent=2)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# Copyright (c) 2025 THL A29 Limited
+#
+# This source code file is made available under LGPL License
+# See LICENSE for details
+# ==============================================================================
+
+"""
+本地SQ Server端口分配
+启动前检查web、内嵌数据库、search和es端口是否可用，
+并通过lock文件在同一机器上的并发任务之间预留端口，避免启动后才发现端口冲突
+"""
+
+import os
+import json
+import socket
+import tempfile
+from time import time
+from typing import Dict
+
+import psutil
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+# SonarQube服务需要的端口及默认值
+SERVER_PORTS = (
+    ("sonar.web.port", 9000),
+    ("sonar.embeddedDatabase.port", 9092),
+    ("sonar.search.port", 9001),
+    ("sonar.es.port", 9002),
+)
+PORT_RANGE = (10000, 65535)
+# 预留记录的有效期，超过之后服务早已绑定端口，预留记录不再需要
+RESERVATION_TTL = 3600
+
+
+class PortAllocator(object):
+    def __init__(self) -> None:
+        self.lock_path = os.path.join(tempfile.gettempdir(), "tca_sq_ports.lock")
+        self.reservation_path = os.path.join(tempfile.gettempdir(), "tca_sq_ports.json")
+        self.ports: Dict[str, int] = dict()
+
+    def allocate(self, preferred: Dict[str, int] = None) -> Dict[str, int]:
+        """
+        分配服务端口，优先使用指定端口，其次默认端口，都不可用时顺序查找空闲端口
+        :param preferred: 指定的端口，比如用户在SONAR_SERVER_PARAMS中设置的端口
+        :return: 属性名到端口的映射
+        """
+        preferred = preferred or dict()
+        lock_fd = self._lock()
+        try:
+            reservations = self._read_reservations()
+            used = set(int(port) for port in reservations)
+            ports = dict()
+            for key, default in SERVER_PORTS:
+                candidates = [preferred[key]] if key in preferred else []
+                candidates.append(default)
+                port = None
+                for candidate in candidates:
+                    if candidate not in used and self.is_port_free(candidate):
+                        port = candidate
+                        break
+                if port is None:
+                    port = self._find_free_port(used)
+                used.add(port)
+                ports[key] = port
+                reservations[str(port)] = {"pid": os.getpid(), "time": time()}
+            self._write_reservations(reservations)
+        finally:
+            self._unlock(lock_fd)
+        self.ports = ports
+        print("[info] 分配SQ Server端口: %s" % ", ".join("%s=%d" % (k, v) for k, v in ports.items()))
+        return ports
+
+    def release(self) -> None:
+        if not self.ports:
+            return
+        lock_fd = self._lock()
+        try:
+            reservations = self._read_reservations()
+            for port in self.ports.values():
+                reservations.pop(str(port), None)
+            self._write_reservations(reservations)
+        finally:
+            self._unlock(lock_fd)
+        self.ports = dict()
+
+    @staticmethod
+    def is_port_free(port: int) -> bool:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            # 与Java的ServerSocket保持一致，允许绑定处于TIME_WAIT状态的端口
+            if os.name != "nt":
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind(("0.0.0.0", port))
+            return True
+        except OSError:
+            return False
+        finally:
+            sock.close()
+
+    def _find_free_port(self, used: set) -> int:
+        # 以进程号为起点分散查找，降低并发任务之间的竞争
+        start, end = PORT_RANGE
+        offset = os.getpid() % (end - start)
+        for i in range(end - start):
+            port = start + (offset + i) % (end - start)
+            if port not in used and self.is_port_free(port):
+                return port
+        raise OSError("No free port in range %d-%d" % PORT_RANGE)
+
+    def _read_reservations(self) -> dict:
+        if not os.path.exists(self.reservation_path):
+            return dict()
+        try:
+            with open(self.reservation_path, "r") as f:
+                reservations = json.load(f)
+        except ValueError:
+            return dict()
+        # 清理进程已经退出或者过期的预留记录
+        now = time()
+        return {
+            port: info
+            for port, info in reservations.items()
+            if psutil.pid_exists(info["pid"]) and now - info["time"] < RESERVATION_TTL
+        }
+
+    def _write_reservations(self, reservations: dict) -> None:
+        temp_path = "%s.%d" % (self.reservation_path, os.getpid())
+        with open(temp_path, "w") as f:
+            json.dump(reservations, f)
+        os.replace(temp_path, self.reservation_path)
+
+    def _lock(self):
+        if fcntl is None:
+            return None
+        lock_fd = open(self.lock_path, "a")
+        fcntl.flock(lock_fd, fcntl.LOCK_EX)
+        return lock_fd
+
+    def _unlock(self, lock_fd) -> None:
+        if lock_fd is None:
+            return
+        fcntl.flock(lock_fd, fcntl.LOCK_UN)
+        lock_fd.close()
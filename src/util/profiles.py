@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# Copyright (c) 2025 THL A29 Limited
+#
+# This source code file is made available under LGPL License
+# See LICENSE for details
+# ==============================================================================
+
+"""
+质量配置缓存
+- ProfileCache: 按(原始配置文件, 任务规则及参数)的哈希缓存过滤后的配置文件，相同规则集的任务不需要重新解析和过滤
+- RestoredProfiles: 记录本地服务上已经导入的配置文件内容哈希，内容没有变化时不需要重新导入
+"""
+
+import os
+import json
+import hashlib
+import threading
+from shutil import copyfile
+from time import time
+from typing import Callable
+
+import settings
+
+# 过滤结果缓存开关，默认开启
+PROFILE_CACHE_ENV = "SQ_PROFILE_CACHE"
+# 超过该天数没有使用的缓存会被清理
+PROFILE_CACHE_DAYS = 30
+# 服务端已导入配置的记录文件，放在data目录下，随数据库一起清理和快照
+RESTORED_STATE_NAME = ".sq_restored_profiles.json"
+
+
+def is_profile_cache_enabled() -> bool:
+    return os.environ.get(PROFILE_CACHE_ENV, "true").lower() not in ("0", "false", "no", "off")
+
+
+def hash_file(path: str) -> str:
+    sha = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class ProfileCache(object):
+    def __init__(self, rules_digest: str, cache_dir: str = os.path.join(settings.TOOL_DIR, "profile_cache")) -> None:
+        """
+        :param rules_digest: 任务规则及参数的哈希
+        :param cache_dir: 缓存目录
+        """
+        self.rules_digest = rules_digest
+        self.cache_dir = cache_dir
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+    def filter(self, src_path: str, dest_path: str, filter_func: Callable[[str, str], None]) -> None:
+        """
+        生成过滤后的配置文件，命中缓存时直接复制
+        :param src_path: 原始配置文件
+        :param dest_path: 过滤后的配置文件
+        :param filter_func: 过滤函数，参数为(src_path, dest_path)
+        :return:
+        """
+        key = hashlib.sha1(("%s:%s" % (hash_file(src_path), self.rules_digest)).encode()).hexdigest()
+        cache_path = os.path.join(self.cache_dir, "%s.xml" % key)
+        if os.path.exists(cache_path):
+            copyfile(cache_path, dest_path)
+            # 更新使用时间，用于清理长时间未使用的缓存
+            os.utime(cache_path, None)
+            print("[info] 使用质量配置缓存: %s" % os.path.basename(src_path))
+            return
+        filter_func(src_path, dest_path)
+        # 并发任务可能同时写入，先写临时文件再替换
+        temp_path = "%s.%d.temp" % (cache_path, os.getpid())
+        copyfile(dest_path, temp_path)
+        os.replace(temp_path, cache_path)
+        self.prune()
+
+    def prune(self) -> None:
+        deadline = time() - PROFILE_CACHE_DAYS * 24 * 3600
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if os.path.getmtime(path) < deadline:
+                    os.remove(path)
+            except OSError:
+                # 其他任务已经清理
+                pass
+
+
+class RestoredProfiles(object):
+    def __init__(self, sonarqube_home: str) -> None:
+        self.state_path = os.path.join(sonarqube_home, "data", RESTORED_STATE_NAME)
+        # 各语言的配置并发导入
+        self._lock = threading.Lock()
+
+    def _read_state(self) -> dict:
+        if not os.path.exists(self.state_path):
+            return dict()
+        try:
+            with open(self.state_path, "r") as f:
+                return json.load(f)
+        except ValueError:
+            return dict()
+
+    def is_restored(self, lang: str, name: str, content_hash: str) -> bool:
+        return self._read_state().get("%s/%s" % (lang, name)) == content_hash
+
+    def record(self, lang: str, name: str, content_hash: str) -> None:
+        with self._lock:
+            state = self._read_state()
+            state["%s/%s" % (lang, name)] = content_hash
+            temp_path = "%s.%d.temp" % (self.state_path, os.getpid())
+            with open(temp_path, "w") as f:
+                json.dump(state, f, indent=2)
+            os.replace(temp_path, self.state_path)
+
+    def clear(self) -> None:
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
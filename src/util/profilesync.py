@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# Copyright (c) 2025 THL A29 Limited
+#
+# This source code file is made available under LGPL License
+# See LICENSE for details
+# ==============================================================================
+
+"""
+质量配置增量同步
+对比配置文件和服务端已有的同名质量配置，只对有变化的规则逐个调用激活/停用接口，避免整个配置重新导入时
+服务端对所有规则重建ES索引。服务端还没有该配置时使用完整导入。
+批量接口(activate_rules/deactivate_rules)只支持按规则查询条件筛选，不能指定规则列表，所以不使用。
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Tuple
+
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+
+from util.exceptions import ClientError, ValidationError
+
+# 同步方式: restore(默认，完整导入)、delta(增量同步)
+SYNC_ENV = "SQ_PROFILE_SYNC"
+# 并发调用单个规则激活/停用接口的线程数
+ACTIVATE_WORKERS = 8
+
+
+def is_delta_sync_enabled() -> bool:
+    return os.environ.get(SYNC_ENV, "restore").lower() == "delta"
+
+
+class ProfileSync(object):
+    def __init__(self, sonar_handle) -> None:
+        self.sonar_handle = sonar_handle
+
+    @staticmethod
+    def parse_profile(path: str) -> Tuple[str, str, Dict[str, Tuple[str, Dict[str, str]]]]:
+        """
+        解析质量配置文件
+        :return: (语言, 配置名, {规则key: (级别, 参数)})
+        """
+        root = ET.ElementTree(file=path).getroot()
+        rules = dict()
+        for rule in root.find("rules"):
+            rule_key = "%s:%s" % (rule.find("repositoryKey").text, rule.find("key").text)
+            params = dict()
+            parameters = rule.find("parameters")
+            if parameters is not None:
+                for parameter in parameters:
+                    params[parameter.find("key").text] = parameter.find("value").text or ""
+            rules[rule_key] = (rule.find("priority").text, params)
+        return root.find("language").text, root.find("name").text, rules
+
+    def sync(self, path: str) -> str:
+        """
+        同步质量配置到服务端
+        :param path: 质量配置文件
+        :return: 使用的同步方式，delta或者restore
+        """
+        lang, name, desired = self.parse_profile(path)
+        profiles = self.sonar_handle.qualityprofiles_search(language=lang, qualityProfile=name).get("profiles", [])
+        profile = next((item for item in profiles if item["name"] == name), None)
+        if profile is None or profile.get("isBuiltIn"):
+            self.sonar_handle.qualityprofiles_restore(path)
+            return "restore"
+        try:
+            self._sync_rules(profile["key"], lang, desired)
+        except (ValidationError, ClientError) as e:
+            print("[warning] 质量配置(%s)增量同步失败，使用完整导入: %s" % (name, str(e)))
+            self.sonar_handle.qualityprofiles_restore(path)
+            return "restore"
+        return "delta"
+
+    def _sync_rules(self, profile_key: str, lang: str, desired: Dict[str, Tuple[str, Dict[str, str]]]) -> None:
+        actives = dict(self.sonar_handle.get_active_rules(profile_key))
+
+        removed = sorted(set(actives) - set(desired))
+        # 新增的规则，以及级别或者参数不一致的规则，逐个激活
+        changed = [
+            rule_key
+            for rule_key, (severity, params) in sorted(desired.items())
+            if rule_key not in actives or self._is_changed(actives[rule_key], severity, params)
+        ]
+        added = sum(1 for rule_key in changed if rule_key not in actives)
+
+        with ThreadPoolExecutor(max_workers=ACTIVATE_WORKERS) as executor:
+            futures = [
+                executor.submit(self.sonar_handle.deactivate_rule, rule_key, profile_key) for rule_key in removed
+            ]
+            futures.extend(
+                executor.submit(
+                    self.sonar_handle.activate_rule,
+                    rule_key,
+                    profile_key,
+                    severity=desired[rule_key][0],
+                    **desired[rule_key][1]
+                )
+                for rule_key in changed
+            )
+            for future in futures:
+                future.result()
+        print("[info] 质量配置增量同步(%s): 停用%d, 新增%d, 更新%d" % (lang, len(removed), added, len(changed) - added))
+
+    @staticmethod
+    def _is_changed(active: dict, severity: str, params: Dict[str, str]) -> bool:
+        if severity and active.get("severity") != severity:
+            return True
+        active_params = {param["key"]: param.get("value", "") for param in active.get("params", [])}
+        return any(value and active_params.get(key) != value for key, value in params.items())
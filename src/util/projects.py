@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# Copyright (c) 2025 THL A29 Limited
+#
+# This source code file is made available under LGPL License
+# See LICENSE for details
+# ==============================================================================
+
+"""
+按代码库保留SQ项目
+同一个代码库的任务使用稳定的projectKey，任务结束后不删除项目，scanner可以复用服务端保存的分析缓存，
+只重新分析有变化的文件。超过指定天数没有分析的项目会被清理。
+只用于常驻模式的本地服务，租约文件保证同一个项目同一时间只有一个任务使用；公共服务无法协调不同机器上的任务，不支持。
+"""
+
+import os
+import re
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Iterable
+
+# 保留项目开关，默认关闭
+KEEP_PROJECT_ENV = "SQ_KEEP_PROJECT"
+# 超过该天数没有分析的项目会被清理
+PROJECT_RETENTION_ENV = "SQ_PROJECT_RETENTION_DAYS"
+PROJECT_RETENTION_DAYS = 14
+# 保留项目的projectKey前缀，与常驻模式下的任务项目(test_<lease>)区分，避免被遗留项目清理删除
+REPO_PROJECT_PREFIX = "tca-repo-"
+
+
+def is_keep_project_enabled() -> bool:
+    return os.environ.get(KEEP_PROJECT_ENV, "false").lower() in ("1", "true", "yes", "on")
+
+
+def get_retention_days() -> int:
+    return int(os.environ.get(PROJECT_RETENTION_ENV, PROJECT_RETENTION_DAYS))
+
+
+def normalize_scm_url(scm_url: str) -> str:
+    """
+    去掉认证信息、末尾的/和.git，协议和域名转为小写
+    """
+    scm_url = scm_url.strip()
+    match = re.match(r"^([a-zA-Z][\w+.-]*://)?(?:[^@/]+@)?([^/:]+)(.*)$", scm_url)
+    if match:
+        scheme, host, path = match.groups()
+        scm_url = "%s%s%s" % ((scheme or "").lower(), host.lower(), path)
+    scm_url = scm_url.rstrip("/")
+    if scm_url.endswith(".git"):
+        scm_url = scm_url[: -len(".git")]
+    return scm_url
+
+
+def make_repository_key(params: dict) -> str:
+    """
+    由代码库地址或者项目id生成稳定的projectKey，都没有时返回None
+    """
+    scm_url = params.get("scm_url")
+    if scm_url:
+        identity = "scm:%s" % normalize_scm_url(scm_url)
+    elif params.get("project_id"):
+        identity = "project:%s" % params["project_id"]
+    else:
+        return None
+    return REPO_PROJECT_PREFIX + hashlib.sha1(identity.encode()).hexdigest()[:20]
+
+
+def prune_repository_projects(sonar_handle, keep_keys: Iterable[str], days: int) -> None:
+    """
+    删除超过指定天数没有分析的保留项目
+    :param sonar_handle:
+    :param keep_keys: 正在使用的项目，不删除
+    :param days:
+    :return:
+    """
+    keep_keys = set(keep_keys)
+    deadline = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%dT%H:%M:%S+0000")
+    for project in list(sonar_handle.get_project(q=REPO_PROJECT_PREFIX, analyzedBefore=deadline)):
+        if project["key"].startswith(REPO_PROJECT_PREFIX) and project["key"] not in keep_keys:
+            print("[info] 清理超过%d天没有分析的项目: %s" % (days, project["key"]))
+            sonar_handle.project_delete(project_key=project["key"])
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# Copyright (c) 2025 THL A29 Limited
+#
+# This source code file is made available under LGPL License
+# See LICENSE for details
+# ==============================================================================
+
+"""
+JVM资源规划
+根据容器(cgroup)或者机器可用的内存和CPU，计算SQ Server的web、ce、search进程以及scanner的堆大小、
+ActiveProcessorCount和GC选择，避免小容器OOM、大机器资源闲置。
+"""
+
+import os
+import math
+from typing import Dict
+
+import psutil
+
+# 资源规划开关，默认关闭
+PLAN_ENV = "SQ_RESOURCE_PLAN"
+
+MB = 1024 * 1024
+# 堆内存之外还有metaspace、线程栈、直接内存和ES的文件缓存，只把这部分比例分配给堆
+HEAP_RATIO = 0.6
+# 各进程堆内存的分配比例以及上下限，单位MB
+HEAP_PLAN = {
+    "web": (0.15, 512, 2048),
+    "ce": (0.25, 512, 4096),
+    "search": (0.25, 512, 4096),
+    "scanner": (0.35, 512, 8192),
+}
+# 堆内存小于该值或者只有一个CPU时使用SerialGC
+SERIAL_GC_HEAP = 1024
+
+
+def is_plan_enabled() -> bool:
+    return os.environ.get(PLAN_ENV, "false").lower() in ("1", "true", "yes", "on")
+
+
+def _read_first_line(path: str) -> str:
+    try:
+        with open(path, "r") as f:
+            return f.readline().strip()
+    except (IOError, OSError):
+        return ""
+
+
+def get_memory_limit() -> int:
+    """
+    获取可用内存上限，单位字节，取cgroup限制和物理内存的较小值
+    """
+    total = psutil.virtual_memory().total
+    # cgroup v2
+    value = _read_first_line("/sys/fs/cgroup/memory.max")
+    if not value:
+        # cgroup v1
+        value = _read_first_line("/sys/fs/cgroup/memory/memory.limit_in_bytes")
+    if value.isdigit() and 0 < int(value) < total:
+        return int(value)
+    return total
+
+
+def get_available_memory() -> int:
+    """
+    获取当前空闲内存，单位字节，容器内取cgroup限制减去已使用量和系统空闲内存的较小值
+    """
+    available = psutil.virtual_memory().available
+    # cgroup v2
+    limit = _read_first_line("/sys/fs/cgroup/memory.max")
+    usage = _read_first_line("/sys/fs/cgroup/memory.current")
+    if not limit:
+        # cgroup v1
+        limit = _read_first_line("/sys/fs/cgroup/memory/memory.limit_in_bytes")
+        usage = _read_first_line("/sys/fs/cgroup/memory/memory.usage_in_bytes")
+    if limit.isdigit() and usage.isdigit() and int(limit) < psutil.virtual_memory().total:
+        available = min(available, max(int(limit) - int(usage), 0))
+    return available
+
+
+def get_cpu_limit() -> int:
+    """
+    获取可用CPU数，考虑cgroup配额和CPU亲和性
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = psutil.cpu_count() or 1
+
+    quota, period = -1, 0
+    # cgroup v2: "max 100000" 或者 "200000 100000"
+    fields = _read_first_line("/sys/fs/cgroup/cpu.max").split()
+    if len(fields) == 2 and fields[0].isdigit() and fields[1].isdigit():
+        quota, period = int(fields[0]), int(fields[1])
+    else:
+        # cgroup v1
+        quota_str = _read_first_line("/sys/fs/cgroup/cpu/cpu.cfs_quota_us")
+        period_str = _read_first_line("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+        if quota_str.lstrip("-").isdigit() and period_str.isdigit():
+            quota, period = int(quota_str), int(period_str)
+    if quota > 0 and period > 0:
+        cpus = min(cpus, int(math.ceil(quota / period)))
+    return max(cpus, 1)
+
+
+def get_instance_min_memory() -> int:
+    """
+    单个本地服务实例(含scanner)需要的最小内存，单位MB
+    """
+    return int(sum(min_mb for _, min_mb, _ in HEAP_PLAN.values()) / HEAP_RATIO)
+
+
+class ResourcePlan(object):
+    def __init__(self, local_server: bool = True, share: int = 1) -> None:
+        """
+        :param local_server: 是否在本机启动服务
+        :param share: 本机同时运行的服务实例数，资源按实例数均分
+        """
+        self.local_server = local_server
+        self.memory_mb = get_memory_limit() // MB // share
+        self.cpus = max(get_cpu_limit() // share, 1)
+        self.procs = HEAP_PLAN if local_server else {"scanner": HEAP_PLAN["scanner"]}
+        self.budget_mb = int(self.memory_mb * HEAP_RATIO)
+        self.min_mb = sum(min_mb for _, min_mb, _ in self.procs.values())
+        self.heaps = self._plan_heaps() if self.is_feasible() else dict()
+
+    def is_feasible(self) -> bool:
+        """
+        堆内存预算是否满足各进程的最小堆，不满足时不做规划，避免堆大小超过容器内存
+        """
+        return self.budget_mb >= self.min_mb
+
+    def _plan_heaps(self) -> Dict[str, int]:
+        # 先满足各进程的最小堆，剩余预算按比例分配，总和不超过预算
+        extra = self.budget_mb - self.min_mb
+        total_ratio = sum(ratio for ratio, _, _ in self.procs.values())
+        heaps = dict()
+        for name, (ratio, min_mb, max_mb) in self.procs.items():
+            heaps[name] = int(min(min_mb + extra * ratio / total_ratio, max_mb))
+        return heaps
+
+    def _gc_opt(self, heap_mb: int) -> str:
+        if heap_mb < SERIAL_GC_HEAP or self.cpus < 2:
+            return "-XX:+UseSerialGC"
+        return "-XX:+UseG1GC"
+
+    def get_server_params(self) -> Dict[str, str]:
+        """
+        SQ Server各进程的JVM参数
+        """
+        if not self.local_server or not self.is_feasible():
+            return dict()
+        cpu_opt = "-XX:ActiveProcessorCount=%d" % self.cpus
+        web = self.heaps["web"]
+        ce = self.heaps["ce"]
+        search = self.heaps["search"]
+        return {
+            "sonar.web.javaOpts": "-Xmx%dm -Xms128m %s %s -XX:+HeapDumpOnOutOfMemoryError"
+            % (web, cpu_opt, self._gc_opt(web)),
+            "sonar.ce.javaOpts": "-Xmx%dm -Xms128m %s %s -XX:+HeapDumpOnOutOfMemoryError"
+            % (ce, cpu_opt, self._gc_opt(ce)),
+            # ES要求最小堆和最大堆一致，GC由ES自身的jvm配置决定
+            "sonar.search.javaOpts": "-Xmx%dm -Xms%dm -XX:MaxDirectMemorySize=%dm %s -XX:+HeapDumpOnOutOfMemoryError"
+            % (search, search, search // 2, cpu_opt),
+        }
+
+    def get_scanner_opts(self) -> str:
+        """
+        scanner的JVM参数，没有规划时返回空字符串
+        """
+        if not self.is_feasible():
+            return ""
+        scanner = self.heaps["scanner"]
+        return "-Xmx%dm -XX:ActiveProcessorCount=%d %s" % (scanner, self.cpus, self._gc_opt(scanner))
+
+    def log(self) -> None:
+        if not self.is_feasible():
+            print(
+                "[warning] 可用内存%dMB的堆内存预算%dMB小于各进程最小堆之和%dMB，不做资源规划"
+                % (self.memory_mb, self.budget_mb, self.min_mb)
+            )
+            return
+        print("[info] 资源规划: 内存%dMB, CPU%d个" % (self.memory_mb, self.cpus))
+        for key, value in self.get_server_params().items():
+            print("[info]   %s=%s" % (key, value))
+        print("[info]   scanner: %s" % self.get_scanner_opts())
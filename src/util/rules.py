@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# Copyright (c) 2025 THL A29 Limited
+#
+# This source code file is made available under LGPL License
+# See LICENSE for details
+# ==============================================================================
+
+"""
+任务规则目录
+任务参数中的规则列表和规则参数在任务开始时索引一次，质量配置过滤和问题过滤都使用该目录
+"""
+
+import json
+import hashlib
+from typing import Dict, List
+
+from util.configlib import ConfigReader
+
+
+class RuleCatalog(object):
+    def __init__(self, rules: List[str], rule_list: List[dict]) -> None:
+        """
+        :param rules: 任务参数中的规则名列表，比如java:S3776
+        :param rule_list: 任务参数中的规则信息列表，包含name和params
+        """
+        self.names: List[str] = list(rules or [])
+        self._name_set = frozenset(self.names)
+        self._params: Dict[str, Dict[str, str]] = dict()
+        for rule_info in rule_list or []:
+            name = rule_info["name"]
+            # 同名规则以第一个为准
+            if name in self._params:
+                continue
+            self._params[name] = self._parse_params(rule_info.get("params"))
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._name_set
+
+    def __len__(self) -> int:
+        return len(self._name_set)
+
+    def digest(self) -> str:
+        """
+        规则集及参数的哈希，与规则顺序无关
+        """
+        content = json.dumps(
+            [sorted(self._name_set), sorted((name, sorted(params.items())) for name, params in self._params.items())]
+        )
+        return hashlib.sha1(content.encode()).hexdigest()
+
+    def get_params(self, name: str) -> Dict[str, str]:
+        """
+        获取规则参数，没有设置参数时返回空dict
+        """
+        return self._params.get(name) or dict()
+
+    @staticmethod
+    def _parse_params(rule_param: str) -> Dict[str, str]:
+        if not rule_param:
+            return dict()
+        if "[sq]" not in rule_param:
+            rule_param = "[sq]\n" + rule_param
+        return ConfigReader(cfg_string=rule_param).read("sq")
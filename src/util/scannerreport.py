@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# Copyright (c) 2025 THL A29 Limited
+#
+# This source code file is made available under LGPL License
+# See LICENSE for details
+# ==============================================================================
+
+"""
+scanner报告读取
+开启sonar.scanner.keepReport后，scanner会在工作目录下保留scanner-report目录(protobuf格式)，
+直接从中读取问题、追溯信息和重复代码块，不需要等待服务端CE处理和ES索引。
+只解码用到的字段，不依赖protobuf库，字段编号见sonar-scanner-protocol中的scanner_report.proto。
+"""
+
+import os
+from collections import namedtuple
+from typing import Dict, Iterator, List, Tuple
+
+# 离线读取问题开关，默认关闭，只用于本地服务
+OFFLINE_ENV = "SQ_OFFLINE_ISSUES"
+REPORT_DIR_NAME = "scanner-report"
+
+# protobuf wire type
+WIRE_VARINT = 0
+WIRE_FIXED64 = 1
+WIRE_LENGTH = 2
+WIRE_FIXED32 = 5
+
+# (start_line, end_line, start_offset, end_offset)
+TextRange = Tuple[int, int, int, int]
+EMPTY_RANGE: TextRange = (0, 0, 0, 0)
+
+ReportComponent = namedtuple("ReportComponent", ["ref", "key", "path", "language"])
+# flows: [[(component_ref, text_range, msg), ...], ...]
+ReportIssue = namedtuple("ReportIssue", ["rule", "msg", "text_range", "flows"])
+# duplicates: [(component_ref, text_range), ...]
+ReportDuplication = namedtuple("ReportDuplication", ["origin", "duplicates"])
+
+
+def is_offline_enabled() -> bool:
+    return os.environ.get(OFFLINE_ENV, "false").lower() in ("1", "true", "yes", "on")
+
+
+class ReportError(Exception):
+    """
+    scanner报告不存在或者无法解析
+    """
+
+
+def _read_varint(buf: bytes, pos: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(buf):
+            raise ReportError("truncated varint")
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+        if shift >= 64:
+            raise ReportError("varint too long")
+
+
+def _iter_fields(buf: bytes) -> Iterator[Tuple[int, object]]:
+    """
+    遍历消息中的字段
+    :return: (字段编号, 值)，varint和定长字段返回int，长度字段返回bytes
+    """
+    pos = 0
+    end = len(buf)
+    while pos < end:
+        tag, pos = _read_varint(buf, pos)
+        field, wire_type = tag >> 3, tag & 0x07
+        if wire_type == WIRE_VARINT:
+            value, pos = _read_varint(buf, pos)
+        elif wire_type == WIRE_LENGTH:
+            length, pos = _read_varint(buf, pos)
+            if pos + length > end:
+                raise ReportError("truncated field %d" % field)
+            value = buf[pos : pos + length]
+            pos += length
+        elif wire_type == WIRE_FIXED64:
+            value = int.from_bytes(buf[pos : pos + 8], "little")
+            pos += 8
+        elif wire_type == WIRE_FIXED32:
+            value = int.from_bytes(buf[pos : pos + 4], "little")
+            pos += 4
+        else:
+            raise ReportError("unsupported wire type %d" % wire_type)
+        yield field, value
+
+
+def _iter_delimited(buf: bytes) -> Iterator[bytes]:
+    """
+    遍历以varint长度分隔的消息流(issues-<ref>.pb、duplications-<ref>.pb)
+    """
+    pos = 0
+    end = len(buf)
+    while pos < end:
+        length, pos = _read_varint(buf, pos)
+        if pos + length > end:
+            raise ReportError("truncated message")
+        yield buf[pos : pos + length]
+        pos += length
+
+
+def _text(value: bytes) -> str:
+    return value.decode("utf-8")
+
+
+def _parse_text_range(buf: bytes) -> TextRange:
+    values = [0, 0, 0, 0]
+    for field, value in _iter_fields(buf):
+        if 1 <= field <= 4:
+            values[field - 1] = value
+    return values[0], values[1], values[2], values[3]
+
+
+def _parse_location(buf: bytes) -> Tuple[int, TextRange, str]:
+    component_ref, text_range, msg = 0, EMPTY_RANGE, ""
+    for field, value in _iter_fields(buf):
+        if field == 1:
+            component_ref = value
+        elif field == 2:
+            text_range = _parse_text_range(value)
+        elif field == 3:
+            msg = _text(value)
+    return component_ref, text_range, msg
+
+
+def _parse_issue(buf: bytes) -> ReportIssue:
+    repository, key, msg, text_range, flows = "", "", "", None, list()
+    for field, value in _iter_fields(buf):
+        if field == 1:
+            repository = _text(value)
+        elif field == 2:
+            key = _text(value)
+        elif field == 3:
+            msg = _text(value)
+        elif field == 6:
+            text_range = _parse_text_range(value)
+        elif field == 7:
+            flows.append([_parse_location(location) for num, location in _iter_fields(value) if num == 1])
+    return ReportIssue("%s:%s" % (repository, key), msg, text_range, flows)
+
+
+def _parse_duplication(buf: bytes) -> ReportDuplication:
+    origin, duplicates = EMPTY_RANGE, list()
+    for field, value in _iter_fields(buf):
+        if field == 1:
+            origin = _parse_text_range(value)
+        elif field == 2:
+            other_ref, text_range = 0, EMPTY_RANGE
+            for num, item in _iter_fields(value):
+                if num == 1:
+                    other_ref = item
+                elif num == 2:
+                    text_range = _parse_text_range(item)
+            duplicates.append((other_ref, text_range))
+    return ReportDuplication(origin, duplicates)
+
+
+class ScannerReport(object):
+    def __init__(self, report_dir: str) -> None:
+        """
+        :param report_dir: scanner-report目录
+        """
+        self.report_dir = report_dir
+        metadata_path = os.path.join(report_dir, "metadata.pb")
+        if not os.path.exists(metadata_path):
+            raise ReportError("%s not found" % metadata_path)
+        self.root_ref = 0
+        for field, value in _iter_fields(self._read(metadata_path)):
+            if field == 5:
+                self.root_ref = value
+        # 组件信息很小，一次读入，追溯信息和重复块通过ref查找路径
+        self.components: Dict[int, ReportComponent] = dict()
+        for name in os.listdir(report_dir):
+            if name.startswith("component-") and name.endswith(".pb"):
+                component = self._parse_component(self._read(os.path.join(report_dir, name)))
+                self.components[component.ref] = component
+        if self.root_ref not in self.components:
+            raise ReportError("root component %d not found" % self.root_ref)
+
+    @staticmethod
+    def _read(path: str) -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+
+    @staticmethod
+    def _parse_component(buf: bytes) -> ReportComponent:
+        ref, key, path, language = 0, "", "", ""
+        for field, value in _iter_fields(buf):
+            if field == 1:
+                ref = value
+            elif field == 6:
+                language = _text(value)
+            elif field == 10:
+                key = _text(value)
+            elif field == 14:
+                path = _text(value)
+        return ReportComponent(ref, key, path, language)
+
+    def _iter_stream(self, prefix: str) -> Iterator[Tuple[ReportComponent, bytes]]:
+        for ref in sorted(self.components):
+            path = os.path.join(self.report_dir, "%s-%d.pb" % (prefix, ref))
+            if not os.path.exists(path):
+                continue
+            for message in _iter_delimited(self._read(path)):
+                yield self.components[ref], message
+
+    def get_path(self, ref: int, default: str = "") -> str:
+        component = self.components.get(ref)
+        return component.path if component is not None else default
+
+    def iter_issues(self) -> Iterator[Tuple[ReportComponent, ReportIssue]]:
+        for component, message in self._iter_stream("issues"):
+            yield component, _parse_issue(message)
+
+    def iter_duplications(self) -> Iterator[Tuple[ReportComponent, List[ReportDuplication]]]:
+        """
+        按文件返回重复代码块
+        """
+        duplications = dict()
+        for component, message in self._iter_stream("duplications"):
+            duplications.setdefault(component.ref, list()).append(_parse_duplication(message))
+        for ref in sorted(duplications):
+            yield self.components[ref], duplications[ref]
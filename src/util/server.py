@@ -9,9 +9,10 @@
 import os
 import sys
 import shlex
-import random
 import psutil
+import json
 import getpass
+import threading
 from shutil import copyfile, rmtree
 from time import sleep, time
 from typing import List
@@ -25,11 +26,22 @@ from util.common import (
     SQ_COMMON_USER,
     COMMON_MODEL,
     LOCAL_MODEL,
+    COMMON_SONAR_LANGS,
     SQBase,
-    kill_proc_famliy,
+    kill_proc_group,
     generate_shell_file,
     Process,
 )
+from util.persistent import ServerLease, is_persistent_enabled
+from util.ports import PortAllocator, SERVER_PORTS
+from util.snapshot import DataSnapshot, is_snapshot_enabled
+from util.profiles import RestoredProfiles
+from util.plugins import PluginOverlay, is_pruning_enabled
+from util.resources import ResourcePlan, is_plan_enabled
+from util.cds import CDSArchive, is_cds_enabled
+from util.pool import ServerPool, get_pool_size
+from util.timeline import StartupTimeline
+from util.webhook import VALIDATE_WEBHOOKS_KEY, is_webhook_enabled
 
 
 class SQRetryError(ConfigError):
@@ -55,15 +67,120 @@ class SQServer():
         self.model = LOCAL_MODEL
 
         self.sleep_second = 5
+        # 状态探测的初始间隔，指数退避到sleep_second
+        self.probe_interval = 0.05
         self.timeout = timeout
         self.is_local_up: bool = False if settings.PLATFORMS[sys.platform] != "windows" else True
         self.start_exception: Exception = None
+        # 启动日志中出现就绪或者失败信息时触发，唤醒等待线程
+        self._start_event = threading.Event()
+        # 启动各阶段耗时
+        self.timeline = StartupTimeline()
 
         self.java_home = os.environ.get("SQ_JDK_HOME")
         self.sonarqube_home = os.environ.get("SONARQUBE_HOME")
-
+        # 原SonarQube目录，插件裁剪和多实例模式下服务使用覆盖层目录
+        self.base_sonarqube_home = self.sonarqube_home
+        # 运行服务的用户，root权限下以非root账户启动时设置
+        self.run_user: str = None
+        self.port_allocator = PortAllocator()
+
+        # 常驻模式，多个任务共享本地服务，每个任务使用独立的projectKey
+        self.lease: ServerLease = None
+        self.is_lease_ready: bool = False
+        self._console_stop = threading.Event()
+
+        # 数据快照，从快照启动时不需要重新初始化数据库、ES索引和规则
+        self.snapshot: DataSnapshot = None
+        self.is_server_ready: bool = False
+        self.is_capture_pending: bool = False
+        self.is_warming_up: bool = False
+
+        # JVM资源规划，本地启动服务时生成
+        self.resource_plan: ResourcePlan = None
+
+        # 多实例模式
+        self.pool: ServerPool = None
+        self.pool_size: int = 1
+
+        # 服务加载的语言，None表示加载全部内置插件
+        self.loaded_languages: List[str] = None
+        self.set_sonarqube_home(self.sonarqube_home)
+
+    def set_sonarqube_home(self, sonarqube_home: str) -> None:
+        """
+        设置服务使用的SonarQube目录，插件裁剪时使用覆盖层目录
+        :param sonarqube_home:
+        :return:
+        """
+        self.sonarqube_home = sonarqube_home
         self.property_path = os.path.join(self.sonarqube_home, "conf", "sonar.properties")
         self.property_temp = os.path.join(self.sonarqube_home, "conf", "sonar.properties.temp")
+        self.console_log = os.path.join(self.sonarqube_home, "logs", "persistent_console.log")
+        self.pid_file = os.path.join(self.sonarqube_home, ".sq_server.pid")
+        if is_persistent_enabled():
+            self.lease = ServerLease(self.sonarqube_home)
+            self.projectKey = "%s_%s" % (SQ_LOCAL_USER["projectKey"], self.lease.lease_id)
+        if is_snapshot_enabled():
+            self.snapshot = self._new_snapshot()
+
+    def _new_snapshot(self) -> DataSnapshot:
+        return DataSnapshot(
+            self.sonarqube_home, os.path.join(settings.ROOT_DIR, "profiles"), base_home=self.base_sonarqube_home
+        )
+
+    def prepare_home(self, languages: str) -> None:
+        """
+        准备服务使用的SonarQube目录: 按语言裁剪插件，多实例模式下获取独立的实例目录
+        :param languages:
+        :return:
+        """
+        if "SQ_TYPE" in os.environ and os.environ.get("SQ_TYPE") == COMMON_MODEL:
+            return
+        if self.is_instance_held():
+            # 已经获取了实例(预热时提前准备目录)
+            return
+        is_pruning = is_pruning_enabled()
+        pool_size = get_pool_size()
+        if pool_size and self.lease is not None:
+            print("[warning] 常驻模式下不支持多实例模式，使用常驻服务")
+            pool_size = 0
+        if not is_pruning and not pool_size:
+            return
+
+        overlay = PluginOverlay(self.sonarqube_home, languages if is_pruning else "")
+        instance = None
+        if pool_size:
+            # 每个任务独占一个实例，实例之间端口、data和temp目录相互独立
+            self.pool = ServerPool(
+                os.path.join(os.path.dirname(os.path.normpath(self.sonarqube_home)), "sq_overlays"),
+                pool_size,
+                self.sleep_second,
+            )
+            self.pool_size = pool_size
+            try:
+                instance = self.pool.acquire(int(os.environ.get("SQ_SERVER_POOL_TIMEOUT", 3600)))
+            except TimeoutError:
+                self._raise_error("等待SQ Server实例超时，请稍后重试", proj_del=False, err_type="analyze")
+        sonarqube_home = overlay.prepare(instance)
+        if sonarqube_home != self.sonarqube_home:
+            self.set_sonarqube_home(sonarqube_home)
+            if overlay.is_supported():
+                self.loaded_languages = overlay.languages
+
+    def release_instance(self) -> None:
+        """
+        多实例模式下归还实例，需要在服务关闭之后调用
+        :return:
+        """
+        if self.pool is not None:
+            self.pool.release()
+
+    def is_instance_held(self) -> bool:
+        """
+        多实例模式下是否还占用实例
+        """
+        return self.pool is not None and self.pool.slot is not None
 
     def set_api_handler(self):
         if self.password:
@@ -82,6 +199,7 @@ class SQServer():
         """
         支持多次重试启动
         """
+        self.prepare_home(languages)
         counter = 1
         while counter <= max_times:
             print(f"[info] The counter of starting sq retry: {counter}")
@@ -106,39 +224,204 @@ class SQServer():
 
         if "SQ_TYPE" in envs and envs.get("SQ_TYPE") == COMMON_MODEL and SQ_COMMON_USER:
             print("[info] Link common...")
+            self.timeline.reset("common")
             self._use_common_sonarqube()
-        elif sys.platform in ("linux", "linux2") and getpass.getuser() == "root":
-            self._root_start_local_sonarqube()
+        elif self.lease is not None:
+            self._start_persistent_sonarqube()
+            return
         else:
-            self._start_local_sonarqube(
-                shlex.split(
-                    generate_shell_file(
-                        f"export PATH={self.java_home}/bin:$PATH\n./bin/run.sh"
-                        if sys.platform != "win32"
-                        else f"set PATH={self.java_home}/bin;%PATH%\nbin\\windows-x86-64\\StartSonar.bat"
-                    )
-                )
-            )
+            self._launch_local_sonarqube()
 
         # 验证服务为UP状态
         self._wait_until_sonarqube_on()
 
+    def _launch_local_sonarqube(self):
+        if sys.platform in ("linux", "linux2") and getpass.getuser() == "root":
+            return self._root_start_local_sonarqube()
+        return self._start_local_sonarqube(
+            shlex.split(
+                generate_shell_file(
+                    f"export PATH={self.java_home}/bin:$PATH\n./bin/run.sh"
+                    if sys.platform != "win32"
+                    else f"set PATH={self.java_home}/bin;%PATH%\nbin\\windows-x86-64\\StartSonar.bat"
+                )
+            )
+        )
+
+    def _start_persistent_sonarqube(self):
+        """
+        常驻模式: 已有服务则直接复用，否则启动服务并登记状态
+        持有锁期间完成启动，避免多个任务同时启动服务
+        """
+        with self.lease:
+            state = self.lease.read_state()
+            if state and self.lease.is_server_alive(state):
+                self.lease.prune_leases(state)
+                if self.lease.need_recycle(state):
+                    print("[info] 常驻服务已执行%d个任务，重启服务" % state.get("tasks", 0))
+                    self.lease.shutdown_server(state)
+                    state = dict()
+            elif state:
+                # 服务进程已经不存在，清理残留状态
+                self.lease.clear_state()
+                state = dict()
+
+            is_launched = not state
+            if state:
+                print("[info] 复用常驻SQ Server, 端口: %s" % state["port"])
+                self.timeline.reset("attach")
+                self.port = state["port"]
+                self.set_api_handler()
+                self.is_local_up = True
+            else:
+                pid = self._launch_local_sonarqube()
+                state = self.lease.new_state(pid, self.port)
+
+            self._wait_until_sonarqube_on()
+            if is_launched and is_webhook_enabled():
+                # 常驻服务只在启动时关闭webhook校验一次，任务之间不修改这个全局设置
+                try:
+                    self.sonar_handle.set_settings(key=VALIDATE_WEBHOOKS_KEY, value="false")
+                except Exception as e:
+                    print("[warning] 关闭webhook校验失败，CE任务通知将使用轮询: %s" % str(e))
+            self.is_lease_ready = True
+
+            self.lease.acquire(state, self.projectKey)
+            self.lease.ensure_watchdog(state)
+            self.lease.write_state(state)
+
     def close(self) -> None:
         """
         关闭服务，恢复现场
         """
-        envs = os.environ
+        if self.lease is not None and self.model == LOCAL_MODEL:
+            if self.is_lease_ready:
+                # 常驻模式下只释放租约，由watchdog在空闲超时后关闭服务
+                if self.lease.is_acquired:
+                    self._release_lease()
+                return
+            # 服务启动失败，关闭服务并清理状态
+            with self.lease:
+                self._reset_local_sonarqube()
+                self.lease.clear_state()
+            return
+        self._reset_local_sonarqube()
+
+    def warmup(self, languages: str = None) -> None:
+        """
+        预热: 从空数据目录启动服务，恢复质量配置后关闭服务并生成数据快照
+        :param languages: 开启插件裁剪时，为这些语言加载的插件集合生成快照，默认全部语言
+        """
+        languages = languages or ",".join(COMMON_SONAR_LANGS)
+        # 与任务使用相同的覆盖层目录，快照按加载的插件集合区分
+        self.prepare_home(languages)
+        # 其他任务正在使用的服务不能关闭，数据目录也不能清理
+        state = ServerLease(self.sonarqube_home).read_state()
+        if state and ServerLease.is_server_alive(state):
+            raise ConfigError("常驻SQ Server正在运行，请在服务关闭后预热")
+        if self._read_pid_file() is not None:
+            raise ConfigError("SQ Server正在运行，请在服务关闭后预热")
+        if self.snapshot is None:
+            self.snapshot = self._new_snapshot()
+        # 预热固定使用独立启动的本地服务
+        self.lease = None
+        self.is_warming_up = True
+        self.close()
+        if os.path.exists(self.snapshot.data_dir):
+            rmtree(self.snapshot.data_dir)
+
+        self.start(languages)
+        if self.model != LOCAL_MODEL:
+            self._raise_error("预热只支持本地SQ Server", proj_del=False, err_type="config")
+        for path in self.snapshot.profile_paths():
+            # 插件裁剪后没有加载的语言无法导入质量配置
+            lang = os.path.basename(path).split("_")[0].lower()
+            if self.loaded_languages is not None and lang not in self.loaded_languages:
+                continue
+            print("[info] 恢复质量配置: %s" % os.path.basename(path))
+            self.sonar_handle.qualityprofiles_restore(path)
+        # 关闭服务时生成快照
+        self.close()
+        self.release_instance()
+        self.is_warming_up = False
+
+    def use_repository_project(self, project_key: str) -> bool:
+        """
+        使用按代码库保留的项目，只用于常驻模式的本地服务，通过租约文件保证同一时间只有一个任务使用该项目
+        公共服务无法协调其他机器上的任务，不保留项目
+        :return: 是否使用
+        """
+        if self.model != LOCAL_MODEL:
+            print("[info] 公共服务不保留项目")
+            return False
+        if self.lease is None or not self.is_lease_ready:
+            print("[info] 本地服务不是常驻模式，任务结束后不保留项目")
+            return False
+        if not self.lease.claim_project(project_key):
+            print("[info] 其他任务正在使用项目%s，使用独立项目" % project_key)
+            return False
+        self.projectKey = project_key
+        print("[info] 使用保留的项目: %s" % project_key)
+        return True
+
+    def active_projects(self) -> list:
+        """
+        常驻模式下其他任务正在使用的项目
+        """
+        if self.model != LOCAL_MODEL or self.lease is None:
+            return list()
+        with self.lease:
+            return self.lease.active_projects(self.lease.read_state())
+
+    def _release_lease(self):
+        """
+        释放租约，按需清理异常任务遗留的项目
+        """
+        state = self.lease.release()
+        if not self.lease.need_housekeeping(state):
+            return
+        active_projects = set(self.lease.active_projects(state))
+        prefix = "%s_" % SQ_LOCAL_USER["projectKey"]
+        try:
+            for project in list(self.sonar_handle.get_project(q=prefix)):
+                if project["key"].startswith(prefix) and project["key"] not in active_projects:
+                    print("[info] 清理遗留项目: %s" % project["key"])
+                    self.sonar_handle.project_delete(project_key=project["key"])
+        except Exception as e:
+            print("[warning] 清理常驻服务遗留项目失败: %s" % str(e))
+
+    def _reset_local_sonarqube(self) -> None:
+        """
+        关闭本地服务，恢复现场
+        """
         # 关闭SonarQube服务
         if self.model == LOCAL_MODEL:
+            self._console_stop.set()
+            if self._is_owned_by_other():
+                # 其他任务正在使用的服务，不关闭，也不清理配置和数据
+                print("[info] SQ Server由其他任务启动，不关闭")
+                self.is_server_ready = False
+                self.start_exception = None
+                self.port_allocator.release()
+                return
+            if self.is_capture_pending and self.is_server_ready:
+                # 首次从空数据目录启动成功，正常关闭服务后生成快照
+                self.is_capture_pending = False
+                self._kill_sonar(timeout=60)
+                self.snapshot.capture()
             self._kill_sonar()
+            self.is_server_ready = False
 
             self.start_exception = None
-            if "SONAR_SERVER_PARAMS" in envs and os.path.exists(self.property_temp):
+            self.port_allocator.release()
+            if os.path.exists(self.property_temp):
                 os.remove(self.property_path)
                 os.rename(self.property_temp, self.property_path)
 
             if os.path.exists(os.path.join(self.sonarqube_home, "data", "sonar.mv.db")):
                 os.remove(os.path.join(self.sonarqube_home, "data", "sonar.mv.db"))
+            # 数据库删除后，已导入的质量配置记录也失效
+            RestoredProfiles(self.sonarqube_home).clear()
 
     def _use_common_sonarqube(self, model: str = COMMON_MODEL):
         """
@@ -148,6 +431,7 @@ class SQServer():
         """
         sq_user = SQ_COMMON_USER
         self.model = COMMON_MODEL
+        self.loaded_languages = None
 
         self.base_url = sq_user["url"]
         self.port = sq_user["port"]
@@ -175,15 +459,19 @@ class SQServer():
                 command=["useradd", sq_user],
                 cwd=self.sonarqube_home,
             ).wait()
-        Process(
-            command=["chmod", "-R", "777", self.sonarqube_home],
-            cwd=self.sonarqube_home,
-        ).wait()
+        # 插件裁剪时覆盖层目录中的软链接指向原SonarQube目录，两者都需要授权
+        for home in {self.sonarqube_home, envs.get("SONARQUBE_HOME", self.sonarqube_home)}:
+            Process(
+                command=["chmod", "-R", "777", home],
+                cwd=self.sonarqube_home,
+            ).wait()
+            chmod_ancestor_dir(home, 0o777)
         Process(
             command=["chmod", "-R", "777", self.java_home],
             cwd=self.sonarqube_home,
         ).wait()
-        chmod_ancestor_dir(self.sonarqube_home, 0o777)
+
+        self.run_user = sq_user
 
         su_cmd = ["sudo", "-u", sq_user, "bash", "-c"]
         has_sudo = Process(
@@ -206,34 +494,101 @@ class SQServer():
         """
         # 启动之前先杀掉本地的sonarqube进程，恢复现场
         self.close()
+        # 其他任务正在使用的服务不能关闭，也不能改写其数据目录和配置，不再启动第二个服务
+        if self._is_owned_by_other():
+            self._raise_error(
+                "本地SQ Server正在被其他任务使用，请稍后重试，或者通过SQ_SERVER_POOL开启多实例模式",
+                proj_del=False,
+                err_type="config",
+            )
+        self._start_event.clear()
+        self.timeline.reset("cold")
+
+        # 优先从数据快照启动；快照只在预热时生成，任务导入的是过滤后的质量配置，不能作为快照
+        if self.snapshot is not None:
+            if self.is_warming_up:
+                self.is_capture_pending = True
+            elif self.snapshot.exists():
+                self.timeline.reset("snapshot")
+                self.snapshot.restore()
+                self.timeline.mark("snapshot_restored")
+            else:
+                print("[info] SQ Server数据快照不存在或已失效，执行src/warmup.py生成")
 
         envs = os.environ
+        # 保存原有配置，便于恢复；上次异常退出遗留了备份的话，先恢复原有配置，避免重复追加
+        if not os.path.exists(self.property_temp):
+            copyfile(self.property_path, self.property_temp)
+        else:
+            copyfile(self.property_temp, self.property_path)
         # 支持设置sonarqube服务的参数
-        if "SONAR_SERVER_PARAMS" in envs:
-            # 保存原有配置，便于恢复
-            if not os.path.exists(self.property_temp):
-                copyfile(self.property_path, self.property_temp)
-            # 以分号;分割，比如 SONAR_SERVER_PARAMS=sonar.web.javaOpts=-Xmx512m -Xms128m;sonar.ce.javaOpts=-Xmx512m -Xms128m
-            sonar_server_params = envs.get("SONAR_SERVER_PARAMS").strip('"').split(";")
-            f = open(self.property_path, "a")
+        # 以分号;分割，比如 SONAR_SERVER_PARAMS=sonar.web.javaOpts=-Xmx512m -Xms128m;sonar.ce.javaOpts=-Xmx512m -Xms128m
+        sonar_server_params: List[str] = list()
+        preferred_ports = {"sonar.web.port": int(SQ_LOCAL_USER["port"])}
+        for param in envs.get("SONAR_SERVER_PARAMS", "").strip('"').split(";"):
+            key, _, value = param.partition("=")
+            if key.strip() in dict(SERVER_PORTS) and value.strip().isdigit():
+                # 用户指定的端口优先使用
+                preferred_ports[key.strip()] = int(value.strip())
+            elif param:
+                sonar_server_params.append(param)
+        # 按容器可用资源规划各进程JVM参数，用户设置的参数优先
+        if is_plan_enabled():
+            self.resource_plan = ResourcePlan(local_server=True, share=self.pool_size)
+            self.resource_plan.log()
+            user_keys = set(param.partition("=")[0].strip() for param in sonar_server_params)
+            for key, value in self.resource_plan.get_server_params().items():
+                if key not in user_keys:
+                    sonar_server_params.append("%s=%s" % (key, value))
+        # web和ce进程使用CDS归档加速启动
+        if is_cds_enabled():
+            cds = CDSArchive(self.java_home, run_user=self.run_user)
+            if cds.is_supported():
+                user_keys = set(param.partition("=")[0].strip() for param in sonar_server_params)
+                for key, value in cds.get_server_params().items():
+                    if key not in user_keys:
+                        sonar_server_params.append("%s=%s" % (key, value))
+        # 启动前分配可用端口，写入配置
+        ports = self.port_allocator.allocate(preferred_ports)
+        self.port = ports["sonar.web.port"]
+        self.set_api_handler()
+        sonar_server_params.extend("%s=%d" % (key, port) for key, port in ports.items())
+        with open(self.property_path, "a") as f:
             for param in sonar_server_params:
                 f.write("\n%s" % param)
-            f.close()
 
-        # print("[info] cmd: %s" % " ".join(cmd))
-        spc = Process(
-            command=cmd,
-            cwd=self.sonarqube_home,
-            out=self._start_sonarqube_callback,
-            err=self._start_sonarqube_callback,
-            shell=True
-        )
+        if self.lease is not None:
+            # 常驻模式下服务需要脱离当前任务存活，输出重定向到日志文件再跟踪
+            if os.path.exists(self.console_log):
+                os.remove(self.console_log)
+            spc = Process(
+                command=["nohup"] + cmd + [">", shlex.quote(self.console_log), "2>&1"],
+                cwd=self.sonarqube_home,
+                shell=True,
+                start_new_session=True,
+            )
+            self._console_stop.clear()
+            threading.Thread(
+                target=self._follow_console_log, args=(self.console_log, self._start_sonarqube_callback), daemon=True
+            ).start()
+        else:
+            # print("[info] cmd: %s" % " ".join(cmd))
+            spc = Process(
+                command=cmd,
+                cwd=self.sonarqube_home,
+                out=self._start_sonarqube_callback,
+                err=self._start_sonarqube_callback,
+                shell=True,
+                start_new_session=True,
+            )
+        self.timeline.mark("spawn")
         timeout = time() + self.timeout
         while not spc.p.pid:
             sleep(self.sleep_second)
             # 判断时间戳来判断超时
             if timeout < time():
                 self._raise_error("获取Sq进程PID超时，请查看log排查原因", proj_del=False, err_type="analyze")
+        self._write_pid_file(spc.p.pid)
         return spc.p.pid
 
     def _start_sonarqube_callback(self, line):
@@ -243,6 +598,7 @@ class SQServer():
         :return:
         """
         print(f"[info] SQServer: {line}")
+        self.timeline.parse_line(line)
         address_in_use_error: List[str] = [
             "Caused by: java.net.BindException: Address already in use",
             "Caused by: java.net.BindException: 地址已在使用",
@@ -263,29 +619,42 @@ class SQServer():
             if SQ_COMMON_USER:
                 print("[info] Change to common...")
                 self._use_common_sonarqube()
+                self._start_event.set()
             else:
                 if self.start_exception is None:
                     if self.containAnyString(line, address_in_use_error):
+                        # 启动前已检查端口，仍然冲突说明启动过程中端口被抢占，去掉用户指定的端口，重试时重新分配
                         server_params: List[str] = os.environ.get("SONAR_SERVER_PARAMS", "").split(";")
                         new_server_params: List[str] = list()
                         for param in server_params:
                             if param and param.find(".port=") == -1:
                                 new_server_params.append(param)
-                        random_numbers = random.sample(range(10000, 65535), 4)
-                        self.port = random_numbers[0]
-                        print(f"[info] 切换使用端口：{self.port}")
-                        new_server_params.extend([
-                            f"sonar.web.port={self.port}",
-                            f"sonar.embeddedDatabase.port={random_numbers[1]}",
-                            f"sonar.search.port={random_numbers[2]}",
-                            f"sonar.es.port={random_numbers[3]}",
-                        ])
                         os.environ["SONAR_SERVER_PARAMS"] = ";".join(new_server_params)
-                        self.set_api_handler()
                     self.start_exception = SQRetryError(line)
+                    self._start_event.set()
         elif line.find("SonarQube is operational") != -1:
             print("[info] Linking Server.")
             self.is_local_up = True
+            self._start_event.set()
+
+    def _follow_console_log(self, path, callback):
+        """
+        跟踪常驻服务的输出日志，直到服务启动完成
+        :param path:
+        :param callback:
+        :return:
+        """
+        while not os.path.exists(path) and not self._console_stop.is_set():
+            sleep(0.1)
+        if not os.path.exists(path):
+            return
+        with open(path, "r", errors="replace") as f:
+            while not self._console_stop.is_set() and not self.is_lease_ready:
+                line = f.readline()
+                if line:
+                    callback(line)
+                else:
+                    sleep(0.1)
 
     def containAnyString(self, line: str, targets: List[str]) -> bool:
         for target in targets:
@@ -296,28 +665,42 @@ class SQServer():
     def _wait_until_sonarqube_on(self):
         """
         等待sonarqube启动完成
-        :param sonar_handle:
+        启动日志回调触发事件即时唤醒，否则按指数退避探测服务状态
         :return:
         """
         timeout = time() + self.timeout
         is_server_up = False
+        last_status = None
+        interval = self.probe_interval
         print("[info] Wait for Server...")
-        while not is_server_up or not self.is_local_up:
+        while True:
+            if self.start_exception is not None:
+                raise self.start_exception
+
             try:
-                sleep(self.sleep_second)
-                print(f"[info] Checking {self.model} Status...")
                 status = self.sonar_handle.get_system_status().get("status", "DOWN")
-                print("[info] Status is %s" % str(status)[0])
-                is_server_up = True if status == "UP" else False
             except Exception as e:
-                is_server_up = False
+                status = "DOWN"
+            if status != last_status:
+                print(f"[info] {self.model} Status is {status}")
+                last_status = status
+            is_server_up = True if status == "UP" else False
+            if is_server_up:
+                self.timeline.mark("status_up")
+            if is_server_up and self.is_local_up:
+                break
 
             # 判断时间戳来判断超时
             if timeout < time():
                 self._raise_error("等待Sq工具启动超时，请查看log排查原因", proj_del=False, err_type="analyze")
 
-            if self.start_exception is not None:
-                raise self.start_exception
+            if self._start_event.wait(min(interval, max(timeout - time(), 0))):
+                # 日志中出现就绪或失败信息，立即重新探测
+                self._start_event.clear()
+                interval = self.probe_interval
+            else:
+                interval = min(interval * 2, self.sleep_second)
+        self.is_server_ready = True
         print("[info] Server is %s" % str(is_server_up))
         print("[info] Own is %s" % str(self.is_local_up))
         print("[info] Linking Server.")
@@ -333,6 +716,7 @@ class SQServer():
         if proj_del:
             self.sonar_handle.project_delete(project_key=self.projectKey)
         self.close()
+        self.release_instance()
         if err_type == "compile":
             raise CompileTaskError(msg)
         elif err_type == "config":
@@ -340,17 +724,63 @@ class SQServer():
         else:
             raise AnalyzeTaskError(msg)
 
-    def _kill_sonar(self):
+    def _write_pid_file(self, pid: int) -> None:
         """
-        杀掉sonar的进程
+        记录启动的服务进程，服务进程是独立进程组的leader
+        :param pid:
         :return:
         """
-        pids = psutil.pids()
-        for pid in pids:
-            try:
-                p = psutil.Process(pid)
-                if p.name().lower().startswith("java") and " ".join(p.cmdline()).find("lib/sonar-application") != -1:
-                    kill_proc_famliy(pid)
-                    break
-            except Exception as e:
-                print("[info] exception: %s" % str(e))
+        with open(self.pid_file, "w") as f:
+            json.dump({"pid": pid, "create_time": psutil.Process(pid).create_time(), "owner": os.getpid()}, f)
+
+    def _read_pid_file(self) -> int:
+        """
+        读取服务进程号，进程已经退出或者进程号被复用时返回None
+        :return:
+        """
+        info = self._read_pid_info()
+        if info is None:
+            return None
+        try:
+            if psutil.Process(info["pid"]).create_time() == info["create_time"]:
+                return info["pid"]
+        except (KeyError, psutil.NoSuchProcess) as e:
+            print("[info] exception: %s" % str(e))
+        return None
+
+    def _read_pid_info(self) -> dict:
+        if not os.path.exists(self.pid_file):
+            return None
+        try:
+            with open(self.pid_file, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print("[info] exception: %s" % str(e))
+        return None
+
+    def _is_owned_by_other(self) -> bool:
+        """
+        服务是否由其他仍在运行的任务启动
+        """
+        info = self._read_pid_info()
+        if info is None:
+            return False
+        owner = info.get("owner")
+        return bool(owner) and owner != os.getpid() and psutil.pid_exists(owner) and self._read_pid_file() is not None
+
+    def _kill_sonar(self, timeout: int = 30) -> bool:
+        """
+        杀掉sonar的进程，整组发送SIGTERM，超时后SIGKILL
+        只处理当前任务启动的服务，或者启动服务的任务已经退出的服务，其他任务正在使用的服务不处理
+        :param timeout:
+        :return: 是否已经关闭
+        """
+        if self._is_owned_by_other():
+            print("[info] SQ Server由其他任务启动，不关闭")
+            return False
+        pid = self._read_pid_file()
+        if pid is not None:
+            kill_proc_group(pid, timeout)
+        if os.path.exists(self.pid_file):
+            os.remove(self.pid_file)
+        return True
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# Copyright (c) 2025 THL A29 Limited
+#
+# This source code file is made available under LGPL License
+# See LICENSE for details
+# ==============================================================================
+
+"""
+SQ Server数据快照
+启动一次服务完成数据库迁移、ES索引和规则初始化后，对data目录(H2+ES)做快照，
+后续任务启动前直接恢复快照，不再从空数据目录启动。
+快照与SonarQube版本、加载的插件集合、质量配置文件集合绑定，任意一个变化后自动失效。
+快照统一保存在原SonarQube目录下，插件裁剪和多实例模式的覆盖层目录按插件集合使用对应的快照。
+"""
+
+import os
+import sys
+import hashlib
+import subprocess
+from shutil import copytree, rmtree
+
+# 快照开关
+SNAPSHOT_ENV = "SQ_SERVER_SNAPSHOT"
+# 快照完整性标识，复制完成后才写入
+COMPLETE_MARKER = ".complete"
+
+
+def is_snapshot_enabled() -> bool:
+    return os.environ.get(SNAPSHOT_ENV, "").lower() in ("1", "true", "yes", "on")
+
+
+def fast_copy(src: str, dst: str) -> None:
+    """
+    复制目录，linux下优先使用reflink，文件系统不支持时退化为普通复制
+    """
+    if sys.platform in ("linux", "linux2"):
+        subprocess.check_call(["cp", "-a", "--reflink=auto", src, dst])
+    else:
+        copytree(src, dst)
+
+
+class DataSnapshot(object):
+    def __init__(self, sonarqube_home: str, profiles_dir: str, base_home: str = None) -> None:
+        """
+        :param sonarqube_home: 服务使用的SonarQube目录，可能是覆盖层目录
+        :param profiles_dir: 质量配置文件目录
+        :param base_home: 原SonarQube目录，快照保存在该目录下，默认与sonarqube_home相同
+        """
+        base_home = base_home or sonarqube_home
+        self.data_dir = os.path.join(sonarqube_home, "data")
+        self.snapshot_root = os.path.join(base_home, "snapshots")
+        self.profiles_dir = profiles_dir
+        self.version = self.get_version(base_home)
+        self.plugins_key = self.hash_plugins(sonarqube_home)[:12]
+        self.key = "%s_%s_%s" % (self.version, self.plugins_key, self.hash_profiles(profiles_dir)[:16])
+        self.snapshot_dir = os.path.join(self.snapshot_root, self.key)
+
+    @staticmethod
+    def get_version(sonarqube_home: str) -> str:
+        # sonarqube-10.6.0.92116
+        return os.path.basename(os.path.normpath(sonarqube_home)).split("-")[-1]
+
+    @staticmethod
+    def hash_plugins(sonarqube_home: str) -> str:
+        """
+        服务加载的内置插件集合
+        """
+        plugin_dir = os.path.join(sonarqube_home, "lib", "extensions")
+        names = list()
+        if os.path.isdir(plugin_dir):
+            names = sorted(name for name in os.listdir(plugin_dir) if name.endswith(".jar"))
+        return hashlib.sha1(",".join(names).encode()).hexdigest()
+
+    @staticmethod
+    def hash_profiles(profiles_dir: str) -> str:
+        sha = hashlib.sha1()
+        for name in sorted(os.listdir(profiles_dir)):
+            if not name.lower().endswith(".xml"):
+                continue
+            sha.update(name.encode())
+            with open(os.path.join(profiles_dir, name), "rb") as f:
+                sha.update(f.read())
+        return sha.hexdigest()
+
+    def profile_paths(self) -> list:
+        return [
+            os.path.join(self.profiles_dir, name)
+            for name in sorted(os.listdir(self.profiles_dir))
+            if name.lower().endswith("_SonarQube_Profile.xml".lower())
+        ]
+
+    def exists(self) -> bool:
+        return os.path.exists(os.path.join(self.snapshot_dir, COMPLETE_MARKER))
+
+    def restore(self) -> None:
+        """
+        使用快照替换data目录，调用前需要确保服务已经关闭
+        """
+        print("[info] 恢复SQ Server数据快照: %s" % self.key)
+        if os.path.exists(self.data_dir):
+            rmtree(self.data_dir)
+        fast_copy(os.path.join(self.snapshot_dir, "data"), self.data_dir)
+
+    def capture(self) -> None:
+        """
+        对data目录做快照，调用前需要确保服务已经关闭，并清理其他版本的快照
+        """
+        print("[info] 生成SQ Server数据快照: %s" % self.key)
+        temp_dir = "%s.%d" % (self.snapshot_dir, os.getpid())
+        if os.path.exists(temp_dir):
+            rmtree(temp_dir)
+        os.makedirs(temp_dir)
+        fast_copy(self.data_dir, os.path.join(temp_dir, "data"))
+        if os.path.exists(self.snapshot_dir):
+            rmtree(self.snapshot_dir)
+        os.rename(temp_dir, self.snapshot_dir)
+        with open(os.path.join(self.snapshot_dir, COMPLETE_MARKER), "w") as f:
+            f.write(self.key)
+
+        for name in os.listdir(self.snapshot_root):
+            path = os.path.join(self.snapshot_root, name)
+            # 只清理完整的快照，跳过其他任务正在生成的临时目录；其他插件集合的快照仍然有效
+            fields = name.split("_")
+            is_stale = len(fields) != 3 or fields[0] != self.version or fields[1] == self.plugins_key
+            if name != self.key and is_stale and os.path.exists(os.path.join(path, COMPLETE_MARKER)):
+                print("[info] 清理失效快照: %s" % name)
+                rmtree(path, ignore_errors=True)
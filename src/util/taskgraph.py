@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# Copyright (c) 2025 THL A29 Limited
+#
+# This source code file is made available under LGPL License
+# See LICENSE for details
+# ==============================================================================
+
+"""
+任务依赖图
+把扫描前的准备步骤(创建项目、设置、导入质量配置等)建模为依赖图，没有依赖关系的步骤并发执行，
+执行结束后输出各步骤耗时和关键路径。
+"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from time import time
+from typing import Callable, Dict, List
+
+# 并发执行的步骤数
+GRAPH_WORKERS = 4
+
+
+class GraphTask(object):
+    def __init__(self, name: str, func: Callable, deps: List[str]) -> None:
+        self.name = name
+        self.func = func
+        self.deps = deps
+        self.start: float = None
+        self.end: float = None
+
+
+class TaskGraph(object):
+    def __init__(self, max_workers: int = GRAPH_WORKERS) -> None:
+        self.max_workers = max_workers
+        self.tasks: Dict[str, GraphTask] = dict()
+        self.started: float = None
+        self.finished: float = None
+
+    def add(self, name: str, func: Callable, deps: List[str] = ()) -> None:
+        """
+        :param name: 步骤名
+        :param func: 步骤函数，无参数
+        :param deps: 依赖的步骤名，依赖的步骤需要先添加
+        :return:
+        """
+        for dep in deps:
+            if dep not in self.tasks:
+                raise ValueError("unknown dependency %s of %s" % (dep, name))
+        self.tasks[name] = GraphTask(name, func, list(deps))
+
+    def run(self) -> None:
+        """
+        执行所有步骤，任一步骤失败时不再提交新的步骤，等待已经开始的步骤结束后抛出异常
+        """
+        self.started = time()
+        done = set()
+        running = dict()
+        error = None
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while len(done) < len(self.tasks):
+                if error is None:
+                    for task in self.tasks.values():
+                        if task.name in done or task.name in running.values():
+                            continue
+                        if all(dep in done for dep in task.deps):
+                            running[executor.submit(self._run_task, task)] = task.name
+                if not running:
+                    break
+                finished, _ = wait(list(running.keys()), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    if future.exception() is not None:
+                        error = error or future.exception()
+                    else:
+                        done.add(name)
+        self.finished = time()
+        if error is not None:
+            raise error
+
+    @staticmethod
+    def _run_task(task: GraphTask) -> None:
+        task.start = time()
+        try:
+            task.func()
+        finally:
+            task.end = time()
+
+    def critical_path(self) -> List[str]:
+        """
+        关键路径: 从最后结束的步骤开始，沿着最后结束的依赖回溯
+        """
+        finished = [task for task in self.tasks.values() if task.end is not None]
+        if not finished:
+            return list()
+        task = max(finished, key=lambda item: item.end)
+        path = [task.name]
+        while task.deps:
+            task = max((self.tasks[dep] for dep in task.deps), key=lambda item: item.end or 0)
+            path.append(task.name)
+        return path[::-1]
+
+    def to_dict(self) -> dict:
+        return {
+            "elapsed": round(self.finished - self.started, 3) if self.finished else None,
+            "critical_path": self.critical_path(),
+            "tasks": {
+                task.name: {
+                    "deps": task.deps,
+                    "start": round(task.start - self.started, 3) if task.start else None,
+                    "cost": round(task.end - task.start, 3) if task.end else None,
+                }
+                for task in self.tasks.values()
+            },
+        }
+
+    def dump(self, path: str) -> None:
+        info = self.to_dict()
+        print("[info] 准备步骤耗时: %ss, 关键路径: %s" % (info["elapsed"], " -> ".join(info["critical_path"])))
+        with open(path, "w") as f:
+            json.dump(info, f, indent=2)
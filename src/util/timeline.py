@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# Copyright (c) 2025 THL A29 Limited
+#
+# This source code file is made available under LGPL License
+# See LICENSE for details
+# ==============================================================================
+
+"""
+SQ Server启动阶段耗时记录
+从启动日志中解析各进程就绪的时间点，便于跨版本、跨机器追踪启动耗时
+"""
+
+import json
+from time import time
+from typing import Dict
+
+# 启动日志中各阶段的标识
+LOG_PHASES = (
+    ("es_up", "Process[es] is up"),
+    ("web_up", "Process[web] is up"),
+    ("ce_up", "Process[ce] is up"),
+    ("operational", "SonarQube is operational"),
+)
+
+
+class StartupTimeline(object):
+    def __init__(self) -> None:
+        self.mode: str = None
+        self.started: float = None
+        self.phases: Dict[str, float] = dict()
+
+    def reset(self, mode: str) -> None:
+        """
+        :param mode: 启动方式，cold(空数据启动)、snapshot(快照启动)、attach(复用常驻服务)、common(远程服务)
+        :return:
+        """
+        self.mode = mode
+        self.started = time()
+        self.phases = dict()
+
+    def mark(self, phase: str) -> None:
+        # 只记录第一次出现的时间点
+        if self.started is not None and phase not in self.phases:
+            self.phases[phase] = round(time() - self.started, 3)
+
+    def parse_line(self, line: str) -> None:
+        for phase, target in LOG_PHASES:
+            if line.find(target) != -1:
+                self.mark(phase)
+
+    def to_dict(self) -> dict:
+        return {"mode": self.mode, "started": self.started, "phases": self.phases}
+
+    def dump(self, path: str) -> None:
+        print("[info] SQ Server启动耗时: %s" % json.dumps(self.phases))
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
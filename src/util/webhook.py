@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# Copyright (c) 2025 THL A29 Limited
+#
+# This source code file is made available under LGPL License
+# See LICENSE for details
+# ==============================================================================
+
+"""
+CE任务完成通知
+在本机启动一个HTTP服务接收SonarQube的webhook，CE任务处理完成后服务端主动通知，不需要等待轮询间隔。
+webhook请求使用随机密钥签名(X-Sonar-Webhook-HMAC-SHA256)，签名不匹配的请求忽略。
+"""
+
+import os
+import hmac
+import json
+import hashlib
+import secrets
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Dict
+
+# webhook通知开关，默认开启，只用于本地服务
+WEBHOOK_ENV = "SQ_CE_WEBHOOK"
+SIGNATURE_HEADER = "X-Sonar-Webhook-HMAC-SHA256"
+# 服务端默认不允许webhook请求本机地址，本地服务需要关闭该校验
+VALIDATE_WEBHOOKS_KEY = "sonar.validateWebhooks"
+
+
+def is_webhook_enabled() -> bool:
+    return os.environ.get(WEBHOOK_ENV, "true").lower() not in ("0", "false", "no", "off")
+
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        self.send_response(200)
+        self.end_headers()
+        self.server.receiver.handle(body, self.headers.get(SIGNATURE_HEADER, ""))
+
+    def log_message(self, format, *args):
+        # 不输出访问日志
+        pass
+
+
+class WebhookReceiver(object):
+    def __init__(self, host: str = "127.0.0.1") -> None:
+        self.secret = secrets.token_hex(16)
+        self._httpd = HTTPServer((host, 0), _WebhookHandler)
+        self._httpd.receiver = self
+        self._thread: threading.Thread = None
+        self._lock = threading.Lock()
+        self._events: Dict[str, threading.Event] = dict()
+        self.payloads: Dict[str, dict] = dict()
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return "http://%s:%d/" % (host, port)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        print("[info] 启动CE任务通知服务: %s" % self.url)
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread = None
+        self._httpd.server_close()
+
+    def _get_event(self, task_id: str) -> threading.Event:
+        with self._lock:
+            return self._events.setdefault(task_id, threading.Event())
+
+    def handle(self, body: bytes, signature: str) -> None:
+        expected = hmac.new(self.secret.encode(), body, hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(expected, signature):
+            print("[warning] 忽略签名不匹配的webhook请求")
+            return
+        try:
+            payload = json.loads(body.decode("utf-8"))
+        except ValueError:
+            return
+        task_id = payload.get("taskId")
+        if task_id:
+            self.payloads[task_id] = payload
+            self._get_event(task_id).set()
+
+    def wait(self, task_id: str, timeout: float) -> bool:
+        """
+        等待任务完成通知
+        :return: 是否收到通知
+        """
+        return self._get_event(task_id).wait(timeout)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# Copyright (c) 2025 THL A29 Limited
+#
+# This source code file is made available under LGPL License
+# See LICENSE for details
+# ==============================================================================
+
+"""
+结果文件流式写入
+问题逐个写入文件，不需要在内存中保存完整的结果列表。支持JSON数组和JSON Lines两种格式。
+"""
+
+import os
+import json
+from typing import Iterable
+
+# 结果格式: json(默认，JSON数组)、jsonl(每行一个问题)
+FORMAT_ENV = "SQ_RESULT_FORMAT"
+# 开启后不缩进，减小结果文件大小
+COMPACT_ENV = "SQ_RESULT_COMPACT"
+INDENT = 2
+
+
+class ResultWriter(object):
+    def __init__(self, path: str, fmt: str = None, compact: bool = None) -> None:
+        """
+        :param path: 结果文件路径
+        :param fmt: json或者jsonl，不指定时读取环境变量
+        :param compact: 是否去掉缩进，不指定时读取环境变量
+        """
+        envs = os.environ
+        self.path = path
+        self.fmt = (fmt or envs.get(FORMAT_ENV, "json")).lower()
+        if self.fmt not in ("json", "jsonl"):
+            print("[warning] 不支持的结果格式: %s，使用json" % self.fmt)
+            self.fmt = "json"
+        if compact is None:
+            compact = envs.get(COMPACT_ENV, "").lower() in ("1", "true", "yes", "on")
+        self.compact = compact
+        self.count = 0
+        self._temp_path = path + ".temp"
+        self._fp = None
+
+    def __enter__(self):
+        # 先写入临时文件，全部写完后再替换，任务失败时不会留下不完整的结果文件
+        self._fp = open(self._temp_path, "w")
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self._finish()
+            self._fp.close()
+            os.replace(self._temp_path, self.path)
+            print("[info] 写入结果文件: %s, 问题数: %d" % (self.path, self.count))
+        else:
+            self._fp.close()
+            os.remove(self._temp_path)
+
+    def write(self, issue: dict) -> None:
+        if self.fmt == "jsonl":
+            self._fp.write(json.dumps(issue) + "\n")
+        elif self.compact:
+            self._fp.write(("[" if self.count == 0 else ",") + json.dumps(issue, separators=(",", ":")))
+        else:
+            # 和json.dump(issues, fp, indent=2)的格式保持一致
+            lines = json.dumps(issue, indent=INDENT).split("\n")
+            self._fp.write(("[\n" if self.count == 0 else ",\n") + "\n".join(" " * INDENT + line for line in lines))
+        self.count += 1
+
+    def write_all(self, issues: Iterable[dict]) -> int:
+        for issue in issues:
+            self.write(issue)
+        return self.count
+
+    def _finish(self) -> None:
+        if self.fmt == "jsonl":
+            return
+        if self.count == 0:
+            self._fp.write("[]")
+        elif self.compact:
+            self._fp.write("]")
+        else:
+            self._fp.write("\n]")
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# Copyright (c) 2025 THL A29 Limited
+#
+# This source code file is made available under LGPL License
+# See LICENSE for details
+# ==============================================================================
+
+"""
+预热SQ Server，生成数据快照
+"""
+
+import os
+
+from util.common import SQBase
+from util.server import SQServer
+
+
+class SonarQubeWarmup(object):
+    def run(self):
+        """
+        :return:
+        """
+        SQBase.init_env()
+        timeout = int(os.environ.get("SONAR_TIMEOUT", 300))
+        server = SQServer(dict(), timeout)
+        # 开启插件裁剪时，按任务的语言集合生成对应插件集合的快照，逗号分隔
+        server.warmup(os.environ.get("SQ_WARMUP_LANGUAGES", ""))
+
+
+tool = SonarQubeWarmup
+
+
+if __name__ == "__main__":
+    print("-- start warmup ...")
+    tool().run()
+    print("-- end ...")
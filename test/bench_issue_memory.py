@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# Copyright (c) 2025 THL A29 Limited
+#
+# This source code file is made available under LGPL License
+# See LICENSE for details
+# ==============================================================================
+
+"""
+问题记录内存对比: dict格式 vs 紧凑记录(util.issues)
+用法: python3 test/bench_issue_memory.py [问题数]
+"""
+
+import os
+import sys
+import random
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from util.issues import IssueTables  # noqa: E402
+
+N_PATHS = 5000
+N_RULES = 300
+
+
+def gen_raw_issues(count):
+    """
+    模拟SQ接口返回的问题，每次生成新的字符串，与实际解析JSON时一致
+    """
+    rnd = random.Random(0)
+    for i in range(count):
+        path = "src/main/java/com/example/module%d/File%d.java" % (i % 50, rnd.randrange(N_PATHS))
+        rule = "java:S%d" % (1000 + rnd.randrange(N_RULES))
+        msg = "Refactor this method to reduce its Cognitive Complexity from %d to the 15 allowed." % rnd.randrange(99)
+        refs = [(rnd.randrange(1000), rnd.randrange(80), "+1", "".join(path)) for _ in range(rnd.randrange(3))]
+        yield "".join(path), "".join(rule), msg, rnd.randrange(1000), rnd.randrange(80), refs
+
+
+def build_dicts(count):
+    issues = list()
+    for path, rule, msg, line, column, refs in gen_raw_issues(count):
+        issues.append(
+            {
+                "path": path,
+                "rule": rule,
+                "msg": msg,
+                "line": line,
+                "column": column,
+                "refs": [
+                    {"line": r_line, "column": r_column, "msg": r_msg, "tag": None, "path": r_path}
+                    for r_line, r_column, r_msg, r_path in refs
+                ],
+            }
+        )
+    return issues
+
+
+def build_records(count):
+    tables = IssueTables()
+    issues = list()
+    for path, rule, msg, line, column, refs in gen_raw_issues(count):
+        issues.append(
+            tables.make_issue(path, rule, msg, line, column, tuple(tables.make_ref(*ref) for ref in refs))
+        )
+    return tables, issues
+
+
+def measure(func, count):
+    tracemalloc.start()
+    result = func(count)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current, peak
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    mb = 1024.0 * 1024
+    print("issues: %d" % count)
+    for name, func in (("dict", build_dicts), ("record", build_records)):
+        current, peak = measure(func, count)
+        print("%-8s current: %8.1f MB  peak: %8.1f MB  per issue: %6.0f B" % (name, current / mb, peak / mb, current / count))
+
+
+if __name__ == "__main__":
+    main()